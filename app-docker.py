@@ -1,13 +1,25 @@
 import os
 import shutil
 import time
+import heapq
+import math
+import itertools
 import gzip
-import io
 import requests
+from requests.adapters import HTTPAdapter
+from http.cookiejar import DefaultCookiePolicy
 from datetime import datetime, timedelta
 import xml.etree.ElementTree as ET
+try:
+    # lxml serializes XMLTV elements in C; the stdlib API is a drop-in fallback
+    from lxml import etree as xml_etree
+    XML_PULL_PARSER_OPTIONS = {"recover": True}  # Keep going past malformed bits of third-party feeds
+except ImportError:
+    xml_etree = ET
+    XML_PULL_PARSER_OPTIONS = {}
 import threading
-from threading import Thread
+import io
+import tempfile
 import logging
 logger = logging.getLogger("MacReplayXC")
 logger.setLevel(logging.INFO)
@@ -39,13 +51,36 @@ consoleHandler = logging.StreamHandler()
 consoleHandler.setFormatter(consoleFormat)
 logger.addHandler(consoleHandler)
 
-# Docker-optimized ffmpeg paths (system-installed)
-ffmpeg_path = "ffmpeg"
-ffprobe_path = "ffprobe"
+# Docker-optimized ffmpeg paths (system-installed), resolved once via PATH lookup
+ffmpeg_path = shutil.which("ffmpeg") or "ffmpeg"
+ffprobe_path = shutil.which("ffprobe") or "ffprobe"
+
+# HLS segments live only for a few seconds - keep them in RAM (/dev/shm) when available
+hls_temp_root = None
+try:
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        hls_temp_root = os.path.join("/dev/shm", "MacReplayXC_hls")
+        os.makedirs(hls_temp_root, exist_ok=True)
+except OSError:
+    hls_temp_root = None
 
 # Check if the binaries exist
 import subprocess
 
+# Linux fcntl command to resize a pipe buffer (not exported by older Pythons)
+F_SETPIPE_SZ = 1031
+FFMPEG_PIPE_SIZE = 1048576  # 1 MiB, the default unprivileged /proc/sys/fs/pipe-max-size
+
+
+def enlarge_pipe(fd, size=FFMPEG_PIPE_SIZE):
+    """Raise a pipe's kernel buffer so FFmpeg blocks (and wakes the reader) less often. Linux only."""
+    try:
+        import fcntl
+        fcntl.fcntl(fd, getattr(fcntl, "F_SETPIPE_SZ", F_SETPIPE_SZ), size)
+    except (ImportError, OSError) as e:
+        logger.debug(f"Could not enlarge pipe buffer: {e}")
+
+
 
 class ChannelCache:
     """Intelligentes Channel-Caching für bessere Performance."""
@@ -286,7 +321,7 @@ def validate_authentication(username, password, settings=None, client_ip=None):
     system_username = settings.get("username", "admin")
     system_password = settings.get("password", "12345")
     
-    if username != system_username or password != system_password:
+    if not credentials_match(username, password, system_username, system_password):
         logger.warning(f"Authentication failed for user '{username}' from IP: {client_ip}")
         return (False, "Invalid credentials")
     
@@ -295,11 +330,10 @@ def validate_authentication(username, password, settings=None, client_ip=None):
     return (True, None)
 
 
-try:
-    subprocess.run([ffmpeg_path, "-version"], capture_output=True, check=True)
-    subprocess.run([ffprobe_path, "-version"], capture_output=True, check=True)
-    logger.info("FFmpeg and FFprobe found and working")
-except (subprocess.CalledProcessError, FileNotFoundError):
+# Only stat PATH here - spawning "ffmpeg -version" on every start/import is not needed
+if os.path.isabs(ffmpeg_path) and os.path.isabs(ffprobe_path):
+    logger.info(f"FFmpeg and FFprobe found ({ffmpeg_path}, {ffprobe_path})")
+else:
     logger.error("Error: ffmpeg or ffprobe not found!")
 
 import flask
@@ -320,8 +354,14 @@ from flask import (
     send_file,
 )
 from datetime import datetime, timezone
-from functools import wraps
+from functools import wraps, lru_cache
+from types import MappingProxyType
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter, defaultdict
 import secrets
+import hmac
+import hashlib
 import waitress
 import sqlite3
 import atexit
@@ -334,7 +374,9 @@ from utils import (
     is_hls_url,
     validate_proxy_url,
     get_proxy_type,
-    parse_proxy_url
+    parse_proxy_url,
+    json_loads,
+    json_dumps,
 )
 
 app = Flask(__name__)
@@ -357,13 +399,34 @@ logger.info(f"Using database file: {dbPath}")
 vodsDbPath = os.path.join(log_dir, "vods.db")
 logger.info(f"Using VOD database file: {vodsDbPath}")
 
+# Pooled HTTP session for outgoing requests (EPG fallback, VOD proxy, MAC status)
+# so repeated calls to the same host reuse keep-alive connections. Cookies are
+# never stored - every caller sends its own (e.g. per-MAC) cookies explicitly.
+http_session = requests.Session()
+http_session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+http_session.mount("http://", HTTPAdapter(pool_connections=20, pool_maxsize=100))
+http_session.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=100))
+
 occupied = {}
 config = {}
+_config_lock = threading.Lock()
+_last_serialized = None  # bytes of the last config written to disk
+_settings_snapshot = MappingProxyType({})  # read-only view of config["settings"], rebuilt on save
+# Active XC connections are runtime state and never persisted:
+# user_id -> device_id -> {portal_id, channel_id, started_at, last_activity, ip}
+xc_connections = {}
+xc_connections_heap = []  # (last_activity, user_id, device_id), stale entries skipped on pop
+xc_connections_lock = threading.Lock()
 cached_lineup = []
-cached_playlist = None
-last_playlist_host = None
-cached_xmltv = None
+cached_playlist = None  # (playlist template, etag), published as one tuple
+playlist_host_bodies = {}  # (playlist etag, host) -> playlist with the host filled in
+PLAYLIST_HOST_PLACEHOLDER = "{{HOST}}"
+cached_xmltv = None  # (guide bytes, etag), published as one tuple
 last_updated = 0
+last_xmltv_attempt = 0  # start of the latest rebuild, successful or not
+XMLTV_MAX_AGE = 900  # seconds before a served guide triggers a background rebuild
+_playlist_lock = threading.Lock()
+_xmltv_lock = threading.RLock()  # held by refresh_xmltv for the whole rebuild
 hls_manager = None
 
 # Channel Cache für Performance-Optimierung
@@ -487,6 +550,7 @@ defaultSettings = {
     "hls segment duration": "4",
     "hls playlist size": "6",
     "hls max streams": "10",
+    "hls low latency": "false",
     "hls inactive timeout": "30",
     "ffmpeg timeout": "5",
     "test streams": "true",
@@ -519,7 +583,6 @@ defaultXCUser = {
     "allowed_portals": [],  # Empty = all portals
     "created_at": "",
     "expires_at": "",  # Empty = never expires
-    "active_connections": {},  # device_id -> {portal_id, channel_id, started_at, ip}
 }
 
 defaultPortal = {
@@ -539,15 +602,91 @@ defaultPortal = {
     "fallback channels": {},
 }
 
+# (key, default, type) records used by loadConfig to validate stored values
+_SETTINGS_SCHEMA = tuple((key, default, type(default)) for key, default in defaultSettings.items())
+_PORTAL_SCHEMA = tuple((key, default, type(default)) for key, default in defaultPortal.items())
+
+
+@lru_cache(maxsize=32)
+def _hls_ffmpeg_template(segment_type, segment_duration, playlist_size, low_latency, has_proxy):
+    """
+    Build the FFmpeg HLS argv for one settings combination.
+    
+    Per-stream values are left as placeholder tokens (__URL__, __PROXY__,
+    __TIMEOUT__, __SEGPAT__, __PLAYLIST__) which start_stream swaps in.
+    """
+    cmd = [
+        ffmpeg_path,
+        "-fflags", "+genpts+igndts+nobuffer",
+        "-err_detect", "aggressive",
+        "-flags", "low_delay",
+        "-reconnect", "1",
+        "-reconnect_at_eof", "1",
+        "-reconnect_streamed", "1",
+        "-reconnect_delay_max", "15",
+    ]
+    
+    if has_proxy:
+        cmd.extend(["-http_proxy", "__PROXY__"])
+    
+    cmd.extend([
+        "-timeout", "__TIMEOUT__",
+        "-i", "__URL__",
+        "-map", "0",
+        "-c:v", "copy",
+        "-copyts",
+        "-start_at_zero",
+        "-c:a", "aac",
+        "-b:a", "256k",
+        "-af", "aresample=async=1"
+    ])
+    
+    # delete_segments keeps the RAM-backed temp dir bounded to the playlist window
+    hls_flags = "independent_segments+omit_endlist+delete_segments"
+    if low_latency:
+        hls_flags += "+split_by_time"
+    
+    if segment_type == "mpegts":
+        hls_flags += "+program_date_time"
+        cmd.extend([
+            "-mpegts_flags", "pat_pmt_at_frames",
+            "-pcr_period", "20"
+        ])
+    
+    cmd.extend([
+        "-f", "hls",
+        "-hls_time", segment_duration,
+        "-hls_list_size", playlist_size,
+        "-hls_flags", hls_flags,
+        "-hls_segment_type", segment_type,
+        "-hls_segment_filename", "__SEGPAT__",
+        "-start_number", "0",
+        "-flush_packets", "0"
+    ])
+    
+    if segment_type == "fmp4":
+        cmd.extend(["-hls_fmp4_init_filename", "init.mp4"])
+    
+    cmd.append("__PLAYLIST__")
+    return tuple(cmd)
+
 
 class HLSStreamManager:
     """Manages HLS streams with shared access and automatic cleanup."""
     
+    STDERR_RING_SIZE = 65536  # Bytes of FFmpeg stderr kept per stream for diagnostics
+    
     def __init__(self, max_streams=10, inactive_timeout=30):
         self.streams = {}  # Key: "portalId_channelId", Value: stream info dict
         self.max_streams = max_streams
         self.inactive_timeout = inactive_timeout
+        # Guards the stream index and expiry heap only; each stream_info carries its
+        # own 'lock' for process termination and temp dir cleanup
         self.lock = threading.Lock()
+        # Monitor sleeps on this condition until the earliest expiry deadline
+        self._cv = threading.Condition(self.lock)
+        self._expiry_heap = []  # (deadline, stream_key, version), one live entry per stream
+        self._versions = itertools.count(1)  # Distinguishes restarts of the same stream_key
         self.monitor_thread = None
         self.running = False
         logger.info(f"HLS Stream Manager initialized with max_streams={max_streams}, inactive_timeout={inactive_timeout}s")
@@ -560,63 +699,215 @@ class HLSStreamManager:
             self.monitor_thread.start()
             logger.info("HLS Stream Manager monitoring started")
     
+    @staticmethod
+    def _touch(stream_info):
+        """
+        Mark a stream as accessed. Needs no lock: a single dict store is atomic,
+        and the monitor re-reads last_accessed when the stream's deadline comes due.
+        """
+        stream_info['last_accessed'] = time.monotonic()
+    
+    def _schedule(self, stream_key, stream_info):
+        """Push the stream's expiry deadline onto the heap. Caller must hold self.lock."""
+        deadline = stream_info['last_accessed'] + self.inactive_timeout
+        heapq.heappush(self._expiry_heap, (deadline, stream_key, stream_info['version']))
+    
+    def _drain_stderr(self, stream_key, pipe, ring):
+        """Drain FFmpeg's stderr into a bounded ring buffer so FFmpeg never blocks on a full pipe."""
+        try:
+            while True:
+                chunk = pipe.read1(65536)
+                if not chunk:
+                    break
+                ring.extend(chunk)
+                if len(ring) > self.STDERR_RING_SIZE:
+                    del ring[:-self.STDERR_RING_SIZE]
+        except (OSError, ValueError) as e:
+            logger.debug(f"Stopped draining FFmpeg stderr for {stream_key}: {e}")
+        finally:
+            try:
+                pipe.close()
+            except OSError:
+                pass
+    
+    @staticmethod
+    def stderr_tail(stream_info, lines=10):
+        """Return the last lines FFmpeg wrote to stderr for a stream."""
+        ring = stream_info.get('stderr_ring')
+        if not ring:
+            return []
+        return bytes(ring).decode("utf-8", errors="replace").splitlines()[-lines:]
+    
+    def _watch_process(self, stream_key, process):
+        """Block until FFmpeg exits, then wake the monitor so the stream is reaped immediately."""
+        try:
+            returncode = process.wait()
+        except Exception as e:
+            logger.error(f"Error waiting for FFmpeg process of {stream_key}: {e}")
+            returncode = -1
+        
+        with self._cv:
+            stream_info = self.streams.get(stream_key)
+            if stream_info is None or stream_info.get('process') is not process:
+                return
+            stream_info['returncode'] = returncode
+            heapq.heappush(self._expiry_heap, (time.monotonic(), stream_key, stream_info['version']))
+            self._cv.notify_all()
+    
+    @staticmethod
+    def _read_last_msn(playlist_path):
+        """Return the media sequence number of the newest segment in a playlist, or -1."""
+        try:
+            with open(playlist_path) as f:
+                content = f.read()
+        except OSError:
+            return -1
+        
+        media_sequence = 0
+        segment_count = 0
+        for line in content.splitlines():
+            if line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+                try:
+                    media_sequence = int(line.split(":", 1)[1])
+                except ValueError:
+                    pass
+            elif line.startswith("#EXTINF:"):
+                segment_count += 1
+        
+        if segment_count == 0:
+            return -1
+        return media_sequence + segment_count - 1
+    
+    def _watch_playlist(self, stream_key, stream_info):
+        """Watch one stream's playlist while reloads are blocked on it and wake them all on every update."""
+        playlist_path = stream_info['playlist_path']
+        last_mtime = None
+        while True:
+            with self._cv:
+                if self.streams.get(stream_key) is not stream_info or stream_info.get('reload_waiters', 0) == 0:
+                    stream_info['playlist_watcher'] = False
+                    return
+            
+            try:
+                mtime = os.stat(playlist_path).st_mtime_ns
+            except OSError:
+                mtime = None
+            
+            if mtime is not None and mtime != last_mtime:
+                last_mtime = mtime
+                last_msn = self._read_last_msn(playlist_path)
+                with self._cv:
+                    stream_info['last_msn'] = last_msn
+                    self._cv.notify_all()
+            
+            time.sleep(0.05)
+    
+    def wait_for_media_sequence(self, portal_id, channel_id, msn, timeout):
+        """
+        Block until the stream playlist contains segment `msn` (LL-HLS _HLS_msn).
+        
+        All requests blocked on the same stream share a single playlist watcher
+        and are woken together when FFmpeg publishes a new segment.
+        
+        Returns:
+            bool: True if the segment is available, False on timeout or if the stream ended
+        """
+        stream_key = f"{portal_id}_{channel_id}"
+        
+        with self._cv:
+            stream_info = self.streams.get(stream_key)
+            if stream_info is None or stream_info.get('is_passthrough', False):
+                return False
+            
+            stream_info['reload_waiters'] = stream_info.get('reload_waiters', 0) + 1
+            if not stream_info.get('playlist_watcher'):
+                stream_info['playlist_watcher'] = True
+                threading.Thread(target=self._watch_playlist, args=(stream_key, stream_info), daemon=True).start()
+            
+            try:
+                self._cv.wait_for(
+                    lambda: self.streams.get(stream_key) is not stream_info
+                    or stream_info.get('last_msn', -1) >= msn,
+                    timeout=timeout,
+                )
+                return self.streams.get(stream_key) is stream_info and stream_info.get('last_msn', -1) >= msn
+            finally:
+                stream_info['reload_waiters'] -= 1
+    
     def _monitor_loop(self):
-        """Background thread that monitors and cleans up inactive streams."""
+        """Background thread that sleeps until the next stream expiry and cleans up."""
         while self.running:
             try:
-                time.sleep(10)  # Check every 10 seconds
-                self._cleanup_inactive_streams()
+                with self._cv:
+                    streams_to_remove = self._pop_expired_streams()
+                    if not streams_to_remove:
+                        timeout = None
+                        if self._expiry_heap:
+                            timeout = max(0, self._expiry_heap[0][0] - time.monotonic())
+                        self._cv.wait(timeout=timeout)
+                        continue
+                
+                # Clean up streams outside the lock to avoid blocking
+                for stream_key in streams_to_remove:
+                    try:
+                        self._stop_stream(stream_key)
+                    except Exception as e:
+                        logger.error(f"Error stopping stream {stream_key}: {e}")
             except Exception as e:
                 logger.error(f"Error in HLS monitor loop: {e}")
     
-    def _cleanup_inactive_streams(self):
-        """Clean up streams that have been inactive or crashed."""
-        current_time = time.time()
+    def _pop_expired_streams(self):
+        """Pop due heap entries and return keys of crashed or inactive streams. Caller must hold self.lock."""
+        current_time = time.monotonic()
         streams_to_remove = []
         
-        with self.lock:
-            for stream_key, stream_info in self.streams.items():
-                is_passthrough = stream_info.get('is_passthrough', False)
-                
-                # Skip process checks for passthrough streams
-                if not is_passthrough:
-                    # Check if process has crashed
-                    try:
-                        if stream_info['process'].poll() is not None:
-                            returncode = stream_info['process'].returncode
-                            if returncode != 0:
-                                logger.error(f"FFmpeg process crashed for {stream_key} (exit code: {returncode})")
-                            else:
-                                logger.info(f"FFmpeg process ended normally for {stream_key}")
-                            streams_to_remove.append(stream_key)
-                            continue
-                    except Exception as e:
-                        logger.error(f"Error checking process status for {stream_key}: {e}")
-                        streams_to_remove.append(stream_key)
-                        continue
-                
-                # Check if stream is inactive
-                inactive_time = current_time - stream_info['last_accessed']
-                if inactive_time > self.inactive_timeout:
-                    stream_type = "passthrough" if is_passthrough else "FFmpeg"
-                    logger.info(f"Cleaning up inactive {stream_type} stream {stream_key} (idle for {inactive_time:.1f}s)")
-                    streams_to_remove.append(stream_key)
-        
-        # Clean up streams outside the lock to avoid blocking
-        for stream_key in streams_to_remove:
-            try:
-                self._stop_stream(stream_key)
-            except Exception as e:
-                logger.error(f"Error stopping stream {stream_key}: {e}")
+        while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+            _, stream_key, version = heapq.heappop(self._expiry_heap)
+            stream_info = self.streams.get(stream_key)
+            if stream_info is None or stream_key in streams_to_remove:
+                continue
+            
+            returncode = stream_info.get('returncode')
+            if returncode is not None:
+                if returncode != 0:
+                    logger.error(f"FFmpeg process crashed for {stream_key} (exit code: {returncode})")
+                    for line in self.stderr_tail(stream_info):
+                        logger.error(f"FFmpeg [{stream_key}]: {line}")
+                else:
+                    logger.info(f"FFmpeg process ended normally for {stream_key}")
+                streams_to_remove.append(stream_key)
+                continue
+            
+            # Stale entry left behind by an earlier stream with the same key
+            if stream_info['version'] != version:
+                continue
+            
+            # Accessed since this deadline was scheduled - push the real deadline back
+            deadline = stream_info['last_accessed'] + self.inactive_timeout
+            if deadline > current_time:
+                heapq.heappush(self._expiry_heap, (deadline, stream_key, version))
+                continue
+            
+            is_passthrough = stream_info.get('is_passthrough', False)
+            stream_type = "passthrough" if is_passthrough else "FFmpeg"
+            inactive_time = current_time - stream_info['last_accessed']
+            logger.info(f"Cleaning up inactive {stream_type} stream {stream_key} (idle for {inactive_time:.1f}s)")
+            streams_to_remove.append(stream_key)
+        
+        return streams_to_remove
     
     def _stop_stream(self, stream_key):
         """Stop a stream and clean up its resources."""
-        with self.lock:
-            if stream_key not in self.streams:
+        with self._cv:
+            stream_info = self.streams.pop(stream_key, None)
+            if stream_info is None:
                 logger.debug(f"Stream {stream_key} already removed")
                 return
-            
-            stream_info = self.streams[stream_key]
+            # Wake blocked playlist reloads so they notice the stream is gone
+            self._cv.notify_all()
+        
+        # Slow teardown runs under the per-stream lock so other streams stay unaffected
+        with stream_info['lock']:
             is_passthrough = stream_info.get('is_passthrough', False)
             
             # Terminate FFmpeg process (skip for passthrough streams)
@@ -648,20 +939,19 @@ class HLSStreamManager:
             except Exception as e:
                 logger.error(f"Error cleaning up temp dir for {stream_key}: {e}")
             
-            # Remove from active streams
-            del self.streams[stream_key]
             logger.info(f"Stream {stream_key} stopped and cleaned up")
     
     def start_stream(self, portal_id, channel_id, stream_url, proxy=None):
         """Start or reuse an HLS stream for a channel."""
-        import tempfile
-        
         stream_key = f"{portal_id}_{channel_id}"
         
+        # Detect if source is already HLS (outside the lock)
+        is_source_hls = is_hls_url(stream_url)
+        
         with self.lock:
             # Check if stream already exists
             if stream_key in self.streams:
-                self.streams[stream_key]['last_accessed'] = time.time()
+                self._touch(self.streams[stream_key])
                 logger.info(f"Reusing existing HLS stream for {stream_key}")
                 return self.streams[stream_key]
             
@@ -675,13 +965,14 @@ class HLSStreamManager:
             segment_type = settings.get("hls segment type", "mpegts")
             segment_duration = settings.get("hls segment duration", "4")
             playlist_size = settings.get("hls playlist size", "6")
+            low_latency = settings.get("hls low latency", "false") == "true"
+            if low_latency:
+                # Short segments cut on time (not keyframes) so blocked reloads return quickly
+                segment_duration = "1"
             timeout = int(settings.get("ffmpeg timeout", "5")) * 1000000
             
-            # Detect if source is already HLS
-            is_source_hls = is_hls_url(stream_url)
-            
             # Create temp directory for HLS segments
-            temp_dir = tempfile.mkdtemp(prefix=f"MacReplayXC_hls_{stream_key}_")
+            temp_dir = tempfile.mkdtemp(prefix=f"MacReplayXC_hls_{stream_key}_", dir=hls_temp_root)
             playlist_path = os.path.join(temp_dir, "stream.m3u8")
             master_playlist_path = os.path.join(temp_dir, "master.m3u8")
             
@@ -694,11 +985,13 @@ class HLSStreamManager:
                     'temp_dir': temp_dir,
                     'playlist_path': playlist_path,
                     'master_playlist_path': master_playlist_path,
-                    'last_accessed': time.time(),
+                    'last_accessed': time.monotonic(),
+                    'version': next(self._versions),
                     'portal_id': portal_id,
                     'channel_id': channel_id,
                     'stream_url': stream_url,
-                    'is_passthrough': True
+                    'is_passthrough': True,
+                    'lock': threading.Lock()
                 }
                 
                 # Create master playlist that points to the source
@@ -709,69 +1002,25 @@ class HLSStreamManager:
                     f.write(stream_url + "\n")
                 
                 self.streams[stream_key] = stream_info
+                self._schedule(stream_key, stream_info)
+                self._cv.notify_all()
                 logger.info(f"HLS passthrough ready for {stream_key}")
                 return stream_info
             
             # Set segment pattern based on segment type
-            if segment_type == "fmp4":
-                segment_pattern = os.path.join(temp_dir, "seg_%03d.m4s")
-                init_filename = "init.mp4"
-            else:
-                segment_pattern = os.path.join(temp_dir, "seg_%03d.ts")
-                init_filename = None
-            
-            # Build FFmpeg command for HLS
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-fflags", "+genpts+igndts+nobuffer",
-                "-err_detect", "aggressive",
-                "-flags", "low_delay",
-                "-reconnect", "1",
-                "-reconnect_at_eof", "1",
-                "-reconnect_streamed", "1",
-                "-reconnect_delay_max", "15",
-            ]
-            
-            if proxy:
-                ffmpeg_cmd.extend(["-http_proxy", proxy])
-            
-            ffmpeg_cmd.extend(["-timeout", str(timeout)])
-            
-            ffmpeg_cmd.extend([
-                "-i", stream_url,
-                "-map", "0",
-                "-c:v", "copy",
-                "-copyts",
-                "-start_at_zero",
-                "-c:a", "aac",
-                "-b:a", "256k",
-                "-af", "aresample=async=1"
-            ])
-            
-            hls_flags = "independent_segments+omit_endlist"
-            
-            if segment_type == "mpegts":
-                hls_flags += "+program_date_time"
-                ffmpeg_cmd.extend([
-                    "-mpegts_flags", "pat_pmt_at_frames",
-                    "-pcr_period", "20"
-                ])
-            
-            ffmpeg_cmd.extend([
-                "-f", "hls",
-                "-hls_time", segment_duration,
-                "-hls_list_size", playlist_size,
-                "-hls_flags", hls_flags,
-                "-hls_segment_type", segment_type,
-                "-hls_segment_filename", segment_pattern,
-                "-start_number", "0",
-                "-flush_packets", "0"
-            ])
-            
-            if segment_type == "fmp4":
-                ffmpeg_cmd.extend(["-hls_fmp4_init_filename", init_filename])
-            
-            ffmpeg_cmd.append(playlist_path)
+            segment_ext = "m4s" if segment_type == "fmp4" else "ts"
+            segment_pattern = os.path.join(temp_dir, f"seg_%03d.{segment_ext}")
+            
+            # Build FFmpeg command for HLS from the cached template
+            template = _hls_ffmpeg_template(segment_type, segment_duration, playlist_size, low_latency, bool(proxy))
+            substitutions = {
+                "__URL__": stream_url,
+                "__PROXY__": proxy,
+                "__TIMEOUT__": str(timeout),
+                "__SEGPAT__": segment_pattern,
+                "__PLAYLIST__": playlist_path,
+            }
+            ffmpeg_cmd = [substitutions.get(arg, arg) for arg in template]
             
             # Start FFmpeg process
             try:
@@ -782,9 +1031,12 @@ class HLSStreamManager:
                     stdin=subprocess.DEVNULL,
                     stdout=subprocess.DEVNULL,
                     stderr=subprocess.PIPE,
-                    text=True,
-                    bufsize=1
+                    bufsize=65536
                 )
+                stderr_ring = bytearray()
+                threading.Thread(
+                    target=self._drain_stderr, args=(stream_key, process.stderr, stderr_ring), daemon=True
+                ).start()
                 
                 # Store stream info
                 stream_info = {
@@ -792,14 +1044,20 @@ class HLSStreamManager:
                     'temp_dir': temp_dir,
                     'playlist_path': playlist_path,
                     'master_playlist_path': master_playlist_path,
-                    'last_accessed': time.time(),
+                    'last_accessed': time.monotonic(),
+                    'version': next(self._versions),
                     'portal_id': portal_id,
                     'channel_id': channel_id,
                     'stream_url': stream_url,
-                    'is_passthrough': False
+                    'is_passthrough': False,
+                    'stderr_ring': stderr_ring,
+                    'lock': threading.Lock()
                 }
                 
                 self.streams[stream_key] = stream_info
+                self._schedule(stream_key, stream_info)
+                self._cv.notify_all()
+                threading.Thread(target=self._watch_process, args=(stream_key, process), daemon=True).start()
                 logger.info(f"HLS stream started for {stream_key}")
                 return stream_info
                 
@@ -816,37 +1074,33 @@ class HLSStreamManager:
         """Get a file path for a stream."""
         stream_key = f"{portal_id}_{channel_id}"
         
-        with self.lock:
-            if stream_key not in self.streams:
-                return None
-            
-            stream_info = self.streams[stream_key]
-            stream_info['last_accessed'] = time.time()
-            
-            # Handle master playlist
-            if filename == "master.m3u8":
-                if os.path.exists(stream_info['master_playlist_path']):
-                    return stream_info['master_playlist_path']
-                return None
-            
-            # Handle stream playlist
-            if filename == "stream.m3u8":
-                if os.path.exists(stream_info['playlist_path']):
-                    return stream_info['playlist_path']
-                return None
-            
-            # Handle segments
-            file_path = os.path.join(stream_info['temp_dir'], filename)
-            if os.path.exists(file_path):
-                return file_path
-            
+        # Lock-free: dict.get and the last_accessed store are atomic, and a stream
+        # stopped concurrently just yields a missing file
+        stream_info = self.streams.get(stream_key)
+        if stream_info is None:
             return None
+        self._touch(stream_info)
+        
+        # Handle master playlist
+        if filename == "master.m3u8":
+            file_path = stream_info['master_playlist_path']
+        # Handle stream playlist
+        elif filename == "stream.m3u8":
+            file_path = stream_info['playlist_path']
+        # Handle segments
+        else:
+            file_path = os.path.join(stream_info['temp_dir'], filename)
+        
+        if os.path.exists(file_path):
+            return file_path
+        
+        return None
 
 
 def loadConfig():
     try:
-        with open(configFile) as f:
-            data = json.load(f)
+        with open(configFile, "rb") as f:
+            data = json_loads(f.read())
         logger.info(f"Config loaded from {configFile}")
     except FileNotFoundError:
         logger.warning("No existing config found. Creating a new one")
@@ -861,34 +1115,101 @@ def loadConfig():
     data.setdefault("portals", {})
     data.setdefault("settings", {})
 
-    settings = data["settings"]
-    settingsOut = {}
-
-    for setting, default in defaultSettings.items():
-        value = settings.get(setting)
-        if not value or type(default) != type(value):
-            value = default
-        settingsOut[setting] = value
-
-    data["settings"] = settingsOut
-
-    portals = data["portals"]
-    portalsOut = {}
+    data["settings"] = _apply_schema(data["settings"], _SETTINGS_SCHEMA)
+    data["portals"] = {
+        portal_id: _apply_schema(portal, _PORTAL_SCHEMA)
+        for portal_id, portal in data["portals"].items()
+    }
+    # Active XC connections live in memory only; drop any left over from older versions
+    for xc_user in data.get("xc_users", {}).values():
+        xc_user.pop("active_connections", None)
+    if "xc_users" in data:
+        data["xc_users"] = _migrate_xc_user_keys(data["xc_users"])
 
-    for portal in portals:
-        portalsOut[portal] = {}
-        for setting, default in defaultPortal.items():
-            value = portals[portal].get(setting)
-            if not value or type(default) != type(value):
-                value = default
-            portalsOut[portal][setting] = value
+    _persist(data)
+    _publish_settings(data["settings"])
 
-    data["portals"] = portalsOut
+    return data
 
-    with open(configFile, "w") as f:
-        json.dump(data, f, indent=4)
+def _migrate_xc_user_keys(users):
+    """Re-key XC users stored under the old "username_password" id by their username.
 
-    return data
+    Older versions allowed several users with the same username and different
+    passwords. The first one takes the username key; the others keep their old
+    id and are flagged with "legacy_key" so they can still log in until an admin
+    deletes them and re-creates them under a unique username.
+    """
+    migrated = {}
+    conflicts = []
+    for user_id, user in users.items():
+        username = user.get("username") or user_id
+        if user.get("legacy_key"):
+            migrated[user_id] = user
+        elif username not in migrated:
+            migrated[username] = user
+        else:
+            conflicts.append((user_id, user))
+    for user_id, user in conflicts:
+        user["legacy_key"] = True
+        migrated[user_id] = user
+        logger.warning(
+            f"XC user '{user.get('username')}' shares its username with another user; "
+            f"kept under its old id '{user_id}' - delete it and re-create it with a unique username"
+        )
+    return migrated
+
+def _apply_schema(values, schema):
+    """Return a copy of values with empty or mistyped entries replaced by their defaults."""
+    out = {}
+    for key, default, default_type in schema:
+        value = values.get(key)
+        if not value or type(value) is not default_type:
+            # Copy container defaults so portals don't share one list/dict
+            value = default.copy() if default_type in (list, dict) else default
+        out[key] = value
+    return out
+
+def _persist(data=None):
+    """
+    Atomically write the config to disk if it changed since the last write.
+    
+    The serialized bytes are compared with the previous write, so saving an
+    unchanged config costs one serialization and no I/O. The file is written
+    to a temp file, fsynced and renamed over the config, so a crash mid-write
+    never leaves a truncated config behind.
+    
+    Args:
+        data (dict, optional): Config to write. Defaults to the global config.
+        
+    Returns:
+        bool: True if the file was rewritten, False if unchanged
+    """
+    global _last_serialized
+    if data is None:
+        data = config
+    
+    with _config_lock:
+        new_bytes = json_dumps(data, indent=True)
+        if new_bytes == _last_serialized:
+            return False
+        
+        tmp_path = configFile + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(new_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, configFile)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        
+        _last_serialized = new_bytes
+        return True
 
 def getPortals():
     global config
@@ -898,9 +1219,8 @@ def getPortals():
 
 def savePortals(portals):
     try:
-        with open(configFile, "w") as f:
-            config["portals"] = portals
-            json.dump(config, f, indent=4)
+        config["portals"] = portals
+        _persist()
         logger.debug(f"Portals saved to {configFile}")
         
         # ENTFERNT: Aggressive Cache-Invalidierung bei jeder Portal-Speicherung
@@ -910,17 +1230,89 @@ def savePortals(portals):
         logger.error(f"Error saving portals: {e}")
         raise
 
+def _publish_settings(settings):
+    """Replace the read-only settings snapshot handed out by getSettings."""
+    global _settings_snapshot
+    _settings_snapshot = MappingProxyType(dict(settings))
+
+PORTALS_SAVE_DELAY = 5  # Seconds to coalesce deferred portal saves
+_portals_save_timer = None
+_portals_save_timer_lock = threading.Lock()
+
+def schedule_portals_save():
+    """
+    Persist the portals within PORTALS_SAVE_DELAY seconds.
+    
+    For frequent, low-value changes (like MAC reordering on failover): bursts
+    of changes are coalesced into a single config write.
+    """
+    global _portals_save_timer
+    with _portals_save_timer_lock:
+        if _portals_save_timer is None:
+            _portals_save_timer = threading.Timer(PORTALS_SAVE_DELAY, flush_portals_save)
+            _portals_save_timer.daemon = True
+            _portals_save_timer.start()
+
+def flush_portals_save():
+    """Write a pending deferred portal save now."""
+    global _portals_save_timer
+    with _portals_save_timer_lock:
+        if _portals_save_timer is None:
+            return
+        _portals_save_timer.cancel()
+        _portals_save_timer = None
+    try:
+        _persist()
+    except Exception as e:
+        logger.error(f"Error saving portals: {e}")
+
+atexit.register(flush_portals_save)
+
+_refresh_jobs = {}  # job function -> {"running": bool, "dirty": bool}
+_refresh_jobs_lock = threading.Lock()
+
+def schedule_refresh(job, rerun=True):
+    """
+    Run a cache rebuild job (refresh_xmltv, refresh_lineup) in the background.
+    
+    At most one run per job is active; requests arriving while it runs are
+    coalesced into a single rerun once it finishes. With rerun=False a request
+    arriving while the job runs is dropped - used for plain age-based refreshes,
+    where the running job already produces fresh data.
+    """
+    with _refresh_jobs_lock:
+        state = _refresh_jobs.setdefault(job, {"running": False, "dirty": False})
+        if state["running"]:
+            state["dirty"] = state["dirty"] or rerun
+            return
+        state["dirty"] = True
+        state["running"] = True
+    threading.Thread(target=_run_refresh_job, args=(job, state), daemon=True).start()
+
+def _run_refresh_job(job, state):
+    while True:
+        with _refresh_jobs_lock:
+            if not state["dirty"]:
+                state["running"] = False
+                return
+            state["dirty"] = False
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Error in background {job.__name__}: {e}")
+
 def getSettings():
+    """Return a read-only snapshot of the settings. Copy it with dict() before modifying."""
     global config
     if not config:
         config = loadConfig()
-    return config["settings"]
+    return _settings_snapshot
 
 def saveSettings(settings):
     try:
-        with open(configFile, "w") as f:
-            config["settings"] = settings
-            json.dump(config, f, indent=4)
+        config["settings"] = dict(settings)
+        _persist()
+        _publish_settings(config["settings"])
         logger.debug(f"Settings saved to {configFile}")
     except Exception as e:
         logger.error(f"Error saving settings: {e}")
@@ -934,6 +1326,50 @@ def get_db_connection():
     return conn
 
 
+def db_etag(*parts):
+    """
+    ETag for a response built from the channels database.
+    
+    Every committed write changes the DB file's mtime (rollback journal mode),
+    so mtime and size identify the data; parts adds request-dependent inputs
+    such as the host embedded in generated links.
+    """
+    st = os.stat(dbPath)
+    return f"{st.st_mtime_ns:x}-{st.st_size:x}-{hash(parts) & 0xFFFFFFFFFFFFFFFF:x}"
+
+
+def not_modified(etag):
+    """Return a 304 response if the client already holds etag, else None."""
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+
+def content_etag(body):
+    """ETag for a cached response body (str or bytes), computed once when the cache is rebuilt."""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def cached_body_response(body, etag, mimetype):
+    """Serve a cached playlist/guide body; polling clients that already hold it get a 304."""
+    cached = not_modified(etag)
+    if cached is not None:
+        return cached
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def json_response(obj):
+    """Like flask.jsonify, but serialized with json_dumps (orjson when available)."""
+    return flask.Response(json_dumps(obj), mimetype="application/json")
+
+
 def init_db():
     """Initialize the database and create tables if they don't exist."""
     conn = get_db_connection()
@@ -1122,6 +1558,108 @@ def refresh_channels_cache_with_progress():
         editor_refresh_progress["running"] = False
         editor_refresh_progress["current_step"] = "Completed"
 
+PORTAL_REFRESH_WORKERS = 8  # Portals fetched concurrently during a channel refresh
+
+
+def _fetch_portal_channel_data(portal, genre_executor):
+    """Fetch channels, genres and EPG for one portal from ALL its MACs.
+
+    Runs in a worker thread, so it only touches the network and the shared
+    progress dict; database writes happen in refresh_channels_cache. Genre
+    names are fetched on genre_executor while the channel pages load.
+
+    Returns:
+        tuple: (channels map by channel_id, genre names by genre_id, merged EPG by channel_id)
+    """
+    portal_name = portal["name"]
+    url = portal["url"]
+    macs = list(portal["macs"].keys())
+    proxy = portal["proxy"]
+    
+    editor_refresh_progress["current_portal"] = portal_name
+    logger.info(f"Fetching channels for portal: {portal_name} from {len(macs)} MACs")
+    editor_refresh_progress["current_step"] = f"{portal_name}: Found {len(macs)} MAC(s)"
+    
+    # Fetch from ALL MACs and merge
+    all_channels_map = {}  # channel_id -> channel data
+    all_genres_dict = {}  # genre_id -> genre_name
+    tokens = {}  # mac -> token from the channel pass, reused for the EPG pass
+    
+    mac_index = 0
+    for mac in macs:
+        mac_index += 1
+        logger.info(f"Trying MAC: {mac}")
+        editor_refresh_progress["current_step"] = f"{portal_name}: Fetching from MAC {mac_index}/{len(macs)}"
+        try:
+            token = stb.getToken(url, mac, proxy)
+            if token:
+                stb.getProfile(url, mac, token, proxy)
+                tokens[mac] = token
+                editor_refresh_progress["current_step"] = f"{portal_name}: Getting channels and genres from MAC {mac_index}/{len(macs)}"
+                # Channels and genres are independent once the profile is
+                # loaded, so fetch the genres alongside the channel pages
+                genres_future = genre_executor.submit(stb.getGenreNames, url, mac, token, proxy)
+                mac_channels = stb.getAllChannels(url, mac, token, proxy)
+                mac_genres = genres_future.result()
+                
+                if mac_channels:
+                    # Merge channels - add new ones
+                    add_channel = all_channels_map.setdefault
+                    for channel in mac_channels:
+                        add_channel(str(channel["id"]), channel)
+                    logger.info(f"MAC {mac}: Added {len(mac_channels)} channels (total: {len(all_channels_map)})")
+                    editor_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(all_channels_map)} channels"
+                
+                if mac_genres:
+                    all_genres_dict.update(mac_genres)
+                    logger.info(f"MAC {mac}: Added genres (total: {len(all_genres_dict)})")
+                    editor_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(all_genres_dict)} genres"
+                    
+        except Exception as e:
+            logger.error(f"Error fetching from MAC {mac}: {e}")
+            continue
+    
+    merged_epg = {}
+    if all_channels_map and all_genres_dict:
+        logger.info(f"Processing {len(all_channels_map)} total channels for {portal_name}")
+        editor_refresh_progress["current_step"] = f"{portal_name}: Checking EPG availability..."
+        
+        # Fetch EPG data from ALL MACs to check which channels have portal EPG
+        epg_mac_index = 0
+        for mac in macs:
+            epg_mac_index += 1
+            try:
+                editor_refresh_progress["current_step"] = f"{portal_name}: Checking EPG from MAC {epg_mac_index}/{len(macs)}"
+                # The token from the channel pass is seconds old, so reuse it; an
+                # empty result just means no EPG for this MAC. Only MACs without a
+                # token from the channel pass, or whose EPG request failed outright
+                # (getEpg returns None), get a fresh handshake.
+                mac_epg = None
+                token = tokens.get(mac)
+                if token:
+                    mac_epg = stb.getEpg(url, mac, token, 24, proxy)
+                    if mac_epg is None:
+                        logger.debug(f"EPG request with reused token failed for MAC {mac}, re-authenticating")
+                        token = None
+                if not token:
+                    token = stb.getToken(url, mac, proxy)
+                    if token:
+                        stb.getProfile(url, mac, token, proxy)
+                        mac_epg = stb.getEpg(url, mac, token, 24, proxy)
+                if mac_epg:
+                    for ch_id, programmes in mac_epg.items():
+                        existing = merged_epg.get(ch_id)
+                        if existing is None or len(programmes) > len(existing):
+                            merged_epg[ch_id] = programmes
+            except Exception as e:
+                logger.error(f"Error fetching EPG from MAC {mac}: {e}")
+                continue
+        
+        logger.info(f"Portal {portal_name}: Got EPG for {len(merged_epg)} channels")
+    
+    return all_channels_map, all_genres_dict, merged_epg
+
+
 def refresh_channels_cache():
     """Refresh the channels cache from STB portals - fetches from ALL MACs."""
     global editor_refresh_progress
@@ -1130,97 +1668,53 @@ def refresh_channels_cache():
     editor_refresh_progress["current_step"] = "Loading portals..."
     
     portals = getPortals()
+    enabled_portals = {
+        portal_id: portal for portal_id, portal in portals.items()
+        if portal["enabled"] == "true"
+    }
     conn = get_db_connection()
     cursor = conn.cursor()
     
     total_channels = 0
     portal_index = 0
     
-    for portal_id in portals:
-        portal = portals[portal_id]
-        if portal["enabled"] == "true":
-            portal_index += 1
+    if not enabled_portals:
+        conn.close()
+        editor_refresh_progress["current_step"] = "Completed! 0 channels from 0 portals"
+        return total_channels
+    
+    # Portal fetches are network-bound, so run them side by side and write each
+    # result to the database from this thread as soon as it arrives
+    # Each portal worker also fetches genres alongside its channel pages on a
+    # shared helper pool, so no threads are started per MAC
+    portal_workers = min(PORTAL_REFRESH_WORKERS, len(enabled_portals))
+    with ThreadPoolExecutor(max_workers=portal_workers) as executor, \
+            ThreadPoolExecutor(max_workers=portal_workers) as genre_executor:
+        futures = {
+            executor.submit(_fetch_portal_channel_data, portal, genre_executor): portal_id
+            for portal_id, portal in enabled_portals.items()
+        }
+        for future in as_completed(futures):
+            portal_id = futures[future]
+            portal = enabled_portals[portal_id]
             portal_name = portal["name"]
-            url = portal["url"]
-            macs = list(portal["macs"].keys())
-            proxy = portal["proxy"]
+            portal_index += 1
             
-            # Update progress
-            editor_refresh_progress["current_portal"] = portal_name
-            editor_refresh_progress["current_step"] = f"Starting {portal_name}..."
-            editor_refresh_progress["portals_done"] = portal_index - 1
+            try:
+                all_channels_map, all_genres_dict, merged_epg = future.result()
+            except Exception as e:
+                logger.error(f"Error refreshing portal {portal_name}: {e}")
+                all_channels_map, all_genres_dict, merged_epg = {}, {}, {}
             
-            # Get existing settings from JSON config for migration
-            enabled_channels = portal.get("enabled channels", [])
+            # Get existing settings from JSON config for migration (set for O(1) lookups per channel)
+            enabled_channels = set(portal.get("enabled channels", []))
             custom_channel_names = portal.get("custom channel names", {})
             custom_genres = portal.get("custom genres", {})
             custom_channel_numbers = portal.get("custom channel numbers", {})
             custom_epg_ids = portal.get("custom epg ids", {})
             fallback_channels = portal.get("fallback channels", {})
             
-            logger.info(f"Fetching channels for portal: {portal_name} from {len(macs)} MACs")
-            editor_refresh_progress["current_step"] = f"{portal_name}: Found {len(macs)} MAC(s)"
-            
-            # Fetch from ALL MACs and merge
-            all_channels_map = {}  # channel_id -> channel data
-            all_genres_dict = {}  # genre_id -> genre_name
-            
-            mac_index = 0
-            for mac in macs:
-                mac_index += 1
-                logger.info(f"Trying MAC: {mac}")
-                editor_refresh_progress["current_step"] = f"{portal_name}: Fetching from MAC {mac_index}/{len(macs)}"
-                try:
-                    token = stb.getToken(url, mac, proxy)
-                    if token:
-                        stb.getProfile(url, mac, token, proxy)
-                        editor_refresh_progress["current_step"] = f"{portal_name}: Getting channels from MAC {mac_index}/{len(macs)}"
-                        mac_channels = stb.getAllChannels(url, mac, token, proxy)
-                        editor_refresh_progress["current_step"] = f"{portal_name}: Getting genres from MAC {mac_index}/{len(macs)}"
-                        mac_genres = stb.getGenreNames(url, mac, token, proxy)
-                        
-                        if mac_channels:
-                            # Merge channels - add new ones
-                            for channel in mac_channels:
-                                channel_id = str(channel["id"])
-                                if channel_id not in all_channels_map:
-                                    all_channels_map[channel_id] = channel
-                            logger.info(f"MAC {mac}: Added {len(mac_channels)} channels (total: {len(all_channels_map)})")
-                            editor_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(all_channels_map)} channels"
-                        
-                        if mac_genres:
-                            all_genres_dict.update(mac_genres)
-                            logger.info(f"MAC {mac}: Added genres (total: {len(all_genres_dict)})")
-                            editor_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(all_genres_dict)} genres"
-                            
-                except Exception as e:
-                    logger.error(f"Error fetching from MAC {mac}: {e}")
-                    continue
-            
             if all_channels_map and all_genres_dict:
-                logger.info(f"Processing {len(all_channels_map)} total channels for {portal_name}")
-                editor_refresh_progress["current_step"] = f"{portal_name}: Checking EPG availability..."
-                
-                # Fetch EPG data from ALL MACs to check which channels have portal EPG
-                merged_epg = {}
-                epg_mac_index = 0
-                for mac in macs:
-                    epg_mac_index += 1
-                    try:
-                        editor_refresh_progress["current_step"] = f"{portal_name}: Checking EPG from MAC {epg_mac_index}/{len(macs)}"
-                        token = stb.getToken(url, mac, proxy)
-                        if token:
-                            stb.getProfile(url, mac, token, proxy)
-                            mac_epg = stb.getEpg(url, mac, token, 24, proxy)
-                            if mac_epg:
-                                for ch_id, programmes in mac_epg.items():
-                                    if ch_id not in merged_epg or len(programmes) > len(merged_epg.get(ch_id, [])):
-                                        merged_epg[ch_id] = programmes
-                    except Exception as e:
-                        logger.error(f"Error fetching EPG from MAC {mac}: {e}")
-                        continue
-                
-                logger.info(f"Portal {portal_name}: Got EPG for {len(merged_epg)} channels")
                 editor_refresh_progress["current_step"] = f"{portal_name}: Saving {len(all_channels_map)} channels to database..."
                 
                 for channel_id, channel in all_channels_map.items():
@@ -1268,11 +1762,10 @@ def refresh_channels_cache():
                 conn.commit()
                 logger.info(f"Successfully cached {len(all_channels_map)} channels for {portal_name}")
                 editor_refresh_progress["current_step"] = f"{portal_name}: Completed - {len(all_channels_map)} channels saved"
-                editor_refresh_progress["portals_done"] = portal_index
             else:
                 logger.error(f"Failed to fetch channels for portal: {portal_name}")
                 editor_refresh_progress["current_step"] = f"{portal_name}: Error - failed to fetch channels"
-                editor_refresh_progress["portals_done"] = portal_index
+            editor_refresh_progress["portals_done"] = portal_index
     
     conn.close()
     logger.info(f"Channel cache refresh complete. Total channels: {total_channels}")
@@ -1292,41 +1785,79 @@ def getXCUsers():
 def saveXCUsers(users):
     """Save XC API users."""
     try:
-        with open(configFile, "w") as f:
-            config["xc_users"] = users
-            json.dump(config, f, indent=4)
+        config["xc_users"] = users
+        _persist()
         logger.debug(f"XC users saved to {configFile}")
     except Exception as e:
         logger.error(f"Error saving XC users: {e}")
         raise
 
 
+@lru_cache(maxsize=1024)
+def _xc_expiry_timestamp(expires_at):
+    """Parse an XC user's expires_at date (YYYY-MM-DD, local time) to an epoch timestamp, or None if invalid."""
+    try:
+        return datetime.strptime(expires_at, "%Y-%m-%d").timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _xc_password_matches(user, password):
+    return hmac.compare_digest(str(user.get("password", "")).encode(), str(password or "").encode())
+
+
 def validateXCUser(username, password):
     """Validate XC API user credentials."""
     users = getXCUsers()
-    user_id = f"{username}_{password}"
-    
-    if user_id not in users:
-        return None, "Invalid credentials"
-    
-    user = users[user_id]
+    user_id = username
+    user = users.get(user_id)
+    
+    if user is None or not _xc_password_matches(user, password):
+        # Users that shared a username before the re-keying keep their old id,
+        # which stays stable when their password changes
+        user_id, user = next(
+            ((legacy_id, legacy) for legacy_id, legacy in users.items()
+             if legacy.get("legacy_key") and legacy.get("username") == username
+             and _xc_password_matches(legacy, password)),
+            (None, None)
+        )
+        if user is None:
+            return None, "Invalid credentials"
     
     if user.get("enabled") != "true":
         return None, "User disabled"
     
-    # Check expiry
+    # Check expiry - the date string is parsed once and memoized
     expires_at = user.get("expires_at", "")
     if expires_at:
-        try:
-            expiry_date = datetime.strptime(expires_at, "%Y-%m-%d")
-            if datetime.now() > expiry_date:
-                return None, "User expired"
-        except:
-            pass
+        expiry_ts = _xc_expiry_timestamp(expires_at)
+        if expiry_ts is not None and time.time() > expiry_ts:
+            return None, "User expired"
     
     return user_id, user
 
 
+def countXCConnections(user_id):
+    """Return the number of active connections of an XC user."""
+    with xc_connections_lock:
+        return len(xc_connections.get(user_id, {}))
+
+
+def _expire_xc_connections(max_idle):
+    """Drop connections idle for max_idle seconds or more. Caller must hold xc_connections_lock."""
+    cutoff = time.time() - max_idle
+    while xc_connections_heap and xc_connections_heap[0][0] <= cutoff:
+        last_activity, user_id, device_id = heapq.heappop(xc_connections_heap)
+        active_connections = xc_connections.get(user_id)
+        conn = active_connections.get(device_id) if active_connections else None
+        # Stale entry - connection was refreshed or removed after this was pushed
+        if conn is None or conn["last_activity"] != last_activity:
+            continue
+        del active_connections[device_id]
+        if not active_connections:
+            del xc_connections[user_id]
+
+
 def checkXCConnectionLimit(user_id, device_id):
     """Check if user can start a new connection."""
     users = getXCUsers()
@@ -1335,94 +1866,74 @@ def checkXCConnectionLimit(user_id, device_id):
     
     user = users[user_id]
     max_connections = int(user.get("max_connections", 1))
-    active_connections = user.get("active_connections", {})
-    
-    # Clean up old connections (older than 60 seconds without activity)
-    current_time = time.time()
-    cleaned_connections = {}
-    modified = False
-    for dev_id, conn in active_connections.items():
-        if current_time - conn.get("last_activity", 0) < 60:
-            cleaned_connections[dev_id] = conn
-        else:
-            modified = True
-    
-    # Save if we cleaned up any connections
-    if modified:
-        user["active_connections"] = cleaned_connections
-        saveXCUsers(users)
-    
-    # If this device already has a connection, allow it
-    if device_id in cleaned_connections:
-        return True, "Existing connection"
     
-    # Check if under limit
-    if len(cleaned_connections) >= max_connections:
-        return False, f"Connection limit reached ({max_connections})"
+    with xc_connections_lock:
+        # Clean up old connections (older than 60 seconds without activity)
+        _expire_xc_connections(60)
+        active_connections = xc_connections.get(user_id, {})
+        
+        # If this device already has a connection, allow it
+        if device_id in active_connections:
+            return True, "Existing connection"
+        
+        # Check if under limit
+        if len(active_connections) >= max_connections:
+            return False, f"Connection limit reached ({max_connections})"
     
     return True, "OK"
 
 
 def registerXCConnection(user_id, device_id, portal_id, channel_id, ip):
     """Register a new XC API connection."""
-    users = getXCUsers()
-    if user_id not in users:
+    if user_id not in getXCUsers():
         return False
     
-    if "active_connections" not in users[user_id]:
-        users[user_id]["active_connections"] = {}
-    
-    users[user_id]["active_connections"][device_id] = {
-        "portal_id": portal_id,
-        "channel_id": channel_id,
-        "started_at": time.time(),
-        "last_activity": time.time(),
-        "ip": ip
-    }
-    
-    saveXCUsers(users)
+    now = time.time()
+    with xc_connections_lock:
+        xc_connections.setdefault(user_id, {})[device_id] = {
+            "portal_id": portal_id,
+            "channel_id": channel_id,
+            "started_at": now,
+            "last_activity": now,
+            "ip": ip
+        }
+        heapq.heappush(xc_connections_heap, (now, user_id, device_id))
     return True
 
 
 def updateXCConnectionActivity(user_id, device_id):
     """Update last activity time for a connection."""
-    users = getXCUsers()
-    if user_id in users and device_id in users[user_id].get("active_connections", {}):
-        users[user_id]["active_connections"][device_id]["last_activity"] = time.time()
-        saveXCUsers(users)
+    with xc_connections_lock:
+        conn = xc_connections.get(user_id, {}).get(device_id)
+        if conn is not None:
+            conn["last_activity"] = time.time()
+            heapq.heappush(xc_connections_heap, (conn["last_activity"], user_id, device_id))
 
 
 def unregisterXCConnection(user_id, device_id):
     """Unregister an XC API connection."""
-    users = getXCUsers()
-    if user_id in users and device_id in users[user_id].get("active_connections", {}):
-        del users[user_id]["active_connections"][device_id]
-        saveXCUsers(users)
+    with xc_connections_lock:
+        active_connections = xc_connections.get(user_id)
+        if active_connections is not None:
+            active_connections.pop(device_id, None)
+            if not active_connections:
+                del xc_connections[user_id]
 
 
 def cleanupOldXCConnections():
     """Cleanup connections older than 5 minutes without activity."""
-    users = getXCUsers()
-    current_time = time.time()
-    timeout = 300  # 5 minutes
-    
-    modified = False
-    # Create a copy to avoid RuntimeError if dictionary changes during iteration
-    for user_id, user in list(users.items()):
-        active_connections = user.get("active_connections", {})
-        to_remove = []
-        
-        for device_id, conn_info in active_connections.items():
-            last_activity = conn_info.get("last_activity", 0)
-            if current_time - last_activity > timeout:
-                to_remove.append(device_id)
-        
-        for device_id in to_remove:
-            del active_connections[device_id]
-            modified = True
-    
-    if modified:
-        saveXCUsers(users)
+    with xc_connections_lock:
+        _expire_xc_connections(300)
+
+
+def credentials_match(username, password, expected_username, expected_password):
+    """Compare a username/password pair in constant time so response timing leaks nothing."""
+    if username is None or password is None:
+        return False
+    username_ok = hmac.compare_digest(str(username).encode(), str(expected_username).encode())
+    password_ok = hmac.compare_digest(str(password).encode(), str(expected_password).encode())
+    # Non-short-circuit & so a wrong username costs as much as a wrong password
+    return username_ok & password_ok
 
 
 def authorise(f):
@@ -1497,7 +2008,7 @@ def xc_auth_optional(f):
         username = settings["username"]
         password = settings["password"]
         
-        if auth and auth.username == username and auth.password == password:
+        if auth and credentials_match(auth.username, auth.password, username, password):
             return f(*args, **kwargs)
         
         return make_response(
@@ -1509,13 +2020,11 @@ def xc_auth_optional(f):
     return decorated
 
 def moveMac(portalId, mac):
-    portals = getPortals()
-    macs = portals[portalId]["macs"]
-    x = macs[mac]
-    del macs[mac]
-    macs[mac] = x
-    portals[portalId]["macs"] = macs
-    savePortals(portals)
+    macs = getPortals()[portalId]["macs"]
+    if mac in macs:
+        # Re-inserting moves the key to the end of the insertion-ordered dict
+        macs[mac] = macs.pop(mac)
+        schedule_portals_save()
 
 @app.route("/data/<path:filename>", methods=["GET"])
 def block_data_access(filename):
@@ -1531,7 +2040,7 @@ def login():
         username = request.form.get("username")
         password = request.form.get("password")
         
-        if username == settings["username"] and password == settings["password"]:
+        if credentials_match(username, password, settings["username"], settings["password"]):
             flask.session["authenticated"] = True
             flask.session.permanent = True
             return redirect("/dashboard", code=302)
@@ -2818,20 +3327,54 @@ def vods_series_episodes(portal_id, series_id):
 def home():
     return redirect("/dashboard", code=302)
 
-@app.route("/portals", methods=["GET"])
-@authorise
-def portals():
-    # Check if we should show genre modal
-    show_genre_modal = flask.session.pop('show_genre_modal', False)
-    genre_modal_portal_id = flask.session.pop('genre_modal_portal_id', None)
-    genre_modal_portal_name = flask.session.pop('genre_modal_portal_name', None)
-    
-    return render_template("portals.html", 
-                         portals=getPortals(),
-                         settings=getSettings(),
-                         show_genre_modal=show_genre_modal,
-                         genre_modal_portal_id=genre_modal_portal_id,
-                         genre_modal_portal_name=genre_modal_portal_name)
+@app.route("/portals", methods=["GET"])
+@authorise
+def portals():
+    # Check if we should show genre modal; only touch the session when a flag
+    # is pending so plain page loads don't re-sign the session cookie
+    if 'show_genre_modal' in flask.session:
+        show_genre_modal = flask.session.pop('show_genre_modal', False)
+        genre_modal_portal_id = flask.session.pop('genre_modal_portal_id', None)
+        genre_modal_portal_name = flask.session.pop('genre_modal_portal_name', None)
+    else:
+        show_genre_modal = False
+        genre_modal_portal_id = None
+        genre_modal_portal_name = None
+    
+    return render_template("portals.html", 
+                         portals=getPortals(),
+                         settings=getSettings(),
+                         show_genre_modal=show_genre_modal,
+                         genre_modal_portal_id=genre_modal_portal_id,
+                         genre_modal_portal_name=genre_modal_portal_name)
+
+MAC_TEST_WORKERS = 8  # Stays below the stb session's connection pool size
+
+
+def test_mac(url, mac, proxy):
+    """Authenticate a MAC against a portal and return its expiry, or None if the test failed."""
+    try:
+        token = stb.getToken(url, mac, proxy)
+        if not token:
+            logger.warning(f"MAC {mac} failed to get token")
+            return None
+        stb.getProfile(url, mac, token, proxy)
+        expiry = stb.getExpires(url, mac, token, proxy)
+        if not expiry:
+            logger.warning(f"MAC {mac} got token but no expiry")
+        return expiry or None
+    except Exception as e:
+        logger.error(f"Error testing MAC {mac}: {e}")
+        return None
+
+
+def test_macs(url, macs, proxy):
+    """Test MACs concurrently. Returns {mac: expiry or None} in the order of macs."""
+    if not macs:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MAC_TEST_WORKERS, len(macs))) as executor:
+        return dict(zip(macs, executor.map(lambda mac: test_mac(url, mac, proxy), macs)))
+
 
 @app.route("/portal/test-macs", methods=["POST"])
 @authorise
@@ -2863,37 +3406,18 @@ def portal_test_macs():
             if not url:
                 return flask.jsonify({"error": "Invalid portal URL"}), 400
         
-        results = []
+        macs = [mac.strip() for mac in macs if mac.strip()]
+        logger.info(f"Testing {len(macs)} MAC(s)")
         
-        for mac in macs:
-            mac = mac.strip()
-            if not mac:
-                continue
-            
-            result = {
+        results = []
+        for mac, expiry in test_macs(url, macs, proxy).items():
+            if expiry:
+                logger.info(f"MAC {mac} is valid, expires: {expiry}")
+            results.append({
                 "mac": mac,
-                "valid": False,
-                "expiry": None
-            }
-            
-            try:
-                logger.info(f"Testing MAC: {mac}")
-                token = stb.getToken(url, mac, proxy)
-                if token:
-                    stb.getProfile(url, mac, token, proxy)
-                    expiry = stb.getExpires(url, mac, token, proxy)
-                    if expiry:
-                        result["valid"] = True
-                        result["expiry"] = expiry
-                        logger.info(f"MAC {mac} is valid, expires: {expiry}")
-                    else:
-                        logger.warning(f"MAC {mac} got token but no expiry")
-                else:
-                    logger.warning(f"MAC {mac} failed to get token")
-            except Exception as e:
-                logger.error(f"Error testing MAC {mac}: {e}")
-            
-            results.append(result)
+                "valid": bool(expiry),
+                "expiry": expiry
+            })
         
         return flask.jsonify({"results": results})
     except Exception as e:
@@ -2923,7 +3447,7 @@ def portalsAdd():
     # Support newline-separated MACs
     macs_text = request.form.get("macs", "")
     macs = [m.strip() for m in macs_text.split('\n') if m.strip()]
-    macs = list(set(macs))  # Remove duplicates
+    macs = list(dict.fromkeys(macs))  # Remove duplicates, keeping the entered order
     
     # Validate MAC addresses
     invalid_macs = [mac for mac in macs if not validate_mac_address(mac)]
@@ -2955,21 +3479,17 @@ def portalsAdd():
 
     macsd = {}
 
-    for mac in macs:
-        token = stb.getToken(url, mac, proxy)
-        if token:
-            stb.getProfile(url, mac, token, proxy)
-            expiry = stb.getExpires(url, mac, token, proxy)
-            if expiry:
-                macsd[mac] = expiry
-                logger.info(
-                    "Successfully tested MAC({}) for Portal({})".format(mac, name)
-                )
-                flash(
-                    "Successfully tested MAC({}) for Portal({})".format(mac, name),
-                    "success",
-                )
-                continue
+    for mac, expiry in test_macs(url, macs, proxy).items():
+        if expiry:
+            macsd[mac] = expiry
+            logger.info(
+                "Successfully tested MAC({}) for Portal({})".format(mac, name)
+            )
+            flash(
+                "Successfully tested MAC({}) for Portal({})".format(mac, name),
+                "success",
+            )
+            continue
 
         logger.error("Error testing MAC({}) for Portal({})".format(mac, name))
         flash("Error testing MAC({}) for Portal({})".format(mac, name), "danger")
@@ -3022,7 +3542,7 @@ def portalUpdate():
     # Support newline-separated MACs
     macs_text = request.form["macs"]
     newmacs = [m.strip() for m in macs_text.split('\n') if m.strip()]
-    newmacs = list(set(newmacs))  # Remove duplicates
+    newmacs = list(dict.fromkeys(newmacs))  # Remove duplicates, keeping the entered (priority) order
     streamsPerMac = request.form["streams per mac"]
     epgOffset = request.form["epg offset"]
     proxy = request.form["proxy"].strip()
@@ -3046,24 +3566,24 @@ def portalUpdate():
     oldmacs = portals[id]["macs"]
     macsout = {}
     deadmacs = []
+    invalidate_portal_channels(portals[id]["url"])
 
-    for mac in newmacs:
-        if retest or mac not in oldmacs.keys():
-            token = stb.getToken(url, mac, proxy)
-            if token:
-                stb.getProfile(url, mac, token, proxy)
-                expiry = stb.getExpires(url, mac, token, proxy)
-                if expiry:
-                    macsout[mac] = expiry
-                    logger.info(
-                        "Successfully tested MAC({}) for Portal({})".format(mac, name)
-                    )
-                    flash(
-                        "Successfully tested MAC({}) for Portal({})".format(mac, name),
-                        "success",
-                    )
+    # Test all new (or, on retest, all) MACs concurrently, then report in input order
+    tested = test_macs(url, [mac for mac in newmacs if retest or mac not in oldmacs], proxy)
 
-            if mac not in list(macsout.keys()):
+    for mac in newmacs:
+        if mac in tested:
+            expiry = tested[mac]
+            if expiry:
+                macsout[mac] = expiry
+                logger.info(
+                    "Successfully tested MAC({}) for Portal({})".format(mac, name)
+                )
+                flash(
+                    "Successfully tested MAC({}) for Portal({})".format(mac, name),
+                    "success",
+                )
+            else:
                 deadmacs.append(mac)
 
         if mac in oldmacs.keys() and mac not in deadmacs:
@@ -3118,6 +3638,70 @@ def portal_genre_selection():
     return render_template("genre_selection.html", portal_id=portal_id, portal_name=portal_name)
 
 
+PORTAL_CHANNELS_TTL = 300  # Seconds a portal's merged channel/genre fetch is reused
+_portal_channels_cache = {}  # (url, proxy, macs) -> (fetched_at, channels_map, genres_dict)
+_portal_channels_lock = threading.Lock()
+
+
+def fetch_portal_channels(url, macs, proxy, use_cache=True):
+    """
+    Fetch channels and genre names from all MACs of a portal and merge them.
+    
+    Results are reused for PORTAL_CHANNELS_TTL seconds, so loading genres and
+    then saving the genre selection queries the portal only once.
+    
+    Returns:
+        tuple: (channel_id -> channel dict, genre_id -> genre name), empty on failure
+    """
+    cache_key = (url, proxy, tuple(macs))
+    if use_cache:
+        with _portal_channels_lock:
+            cached = _portal_channels_cache.get(cache_key)
+        if cached and time.time() - cached[0] < PORTAL_CHANNELS_TTL:
+            logger.info(f"Using channels fetched {time.time() - cached[0]:.0f}s ago for {url}")
+            return cached[1], cached[2]
+    
+    all_channels_map = {}  # channel_id -> channel data
+    all_genres_dict = {}  # genre_id -> genre_name
+    
+    logger.info(f"Loading channels from {len(macs)} MACs for {url}")
+    
+    for mac in macs:
+        try:
+            token = stb.getToken(url, mac, proxy)
+            if token:
+                stb.getProfile(url, mac, token, proxy)
+                mac_channels = stb.getAllChannels(url, mac, token, proxy)
+                mac_genres = stb.getGenreNames(url, mac, token, proxy)
+                
+                if mac_channels:
+                    add_channel = all_channels_map.setdefault
+                    for channel in mac_channels:
+                        add_channel(str(channel["id"]), channel)
+                    logger.info(f"MAC {mac}: Added {len(mac_channels)} channels (total now: {len(all_channels_map)})")
+                
+                if mac_genres:
+                    all_genres_dict.update(mac_genres)
+                    logger.info(f"MAC {mac}: Added genres (total now: {len(all_genres_dict)})")
+                    
+        except Exception as e:
+            logger.error(f"Error fetching from MAC {mac}: {e}")
+            continue
+    
+    if all_channels_map and all_genres_dict:
+        with _portal_channels_lock:
+            _portal_channels_cache[cache_key] = (time.time(), all_channels_map, all_genres_dict)
+    
+    return all_channels_map, all_genres_dict
+
+
+def invalidate_portal_channels(url):
+    """Drop cached channel fetches for a portal URL."""
+    with _portal_channels_lock:
+        for cache_key in [key for key in _portal_channels_cache if key[0] == url]:
+            del _portal_channels_cache[cache_key]
+
+
 @app.route("/portal/load-genres", methods=["POST"])
 @authorise
 def portal_load_genres():
@@ -3187,42 +3771,23 @@ def portal_load_genres():
         logger.info(f"Fetching genres from portal {portal_id} (force_refresh={force_refresh})")
         
         url = portal["url"]
-        macs = list(portal["macs"].keys())
+        macs = list(portal["macs"])
         proxy = portal["proxy"]
         
-        all_channels_map = {}  # channel_id -> channel data
-        all_genres_dict = {}  # genre_id -> genre_name
-        
-        logger.info(f"Loading channels from {len(macs)} MACs for portal {portal_id}")
-        
-        for mac in macs:
-            try:
-                token = stb.getToken(url, mac, proxy)
-                if token:
-                    stb.getProfile(url, mac, token, proxy)
-                    mac_channels = stb.getAllChannels(url, mac, token, proxy)
-                    mac_genres = stb.getGenreNames(url, mac, token, proxy)
-                    
-                    if mac_channels:
-                        for channel in mac_channels:
-                            channel_id = str(channel["id"])
-                            if channel_id not in all_channels_map:
-                                all_channels_map[channel_id] = channel
-                        logger.info(f"MAC {mac}: Added {len(mac_channels)} channels (total now: {len(all_channels_map)})")
-                    
-                    if mac_genres:
-                        all_genres_dict.update(mac_genres)
-                        logger.info(f"MAC {mac}: Added genres (total now: {len(all_genres_dict)})")
-                        
-            except Exception as e:
-                logger.error(f"Error fetching from MAC {mac}: {e}")
-                continue
+        all_channels_map, all_genres_dict = fetch_portal_channels(url, macs, proxy, use_cache=not force_refresh)
         
         if not all_channels_map or not all_genres_dict:
             return flask.jsonify({"error": "Failed to fetch channels from any MAC"}), 500
         
         logger.info(f"Total channels loaded from all MACs: {len(all_channels_map)}")
         
+        # Resolve each channel's genre name once (genre ids are str keys, see stb.getGenreNames)
+        genre_name = all_genres_dict.get
+        channel_genres = {
+            channel_id: genre_name(str(channel.get("tv_genre_id", "")))
+            for channel_id, channel in all_channels_map.items()
+        }
+        
         # Save to database for future fast loading
         try:
             conn = get_db_connection()
@@ -3232,20 +3797,17 @@ def portal_load_genres():
             cursor.execute('DELETE FROM channels WHERE portal = ?', (portal_id,))
             
             # Insert all channels
-            for channel_id, channel in all_channels_map.items():
-                channel_name = str(channel.get("name", ""))
-                channel_number = str(channel.get("number", ""))
-                genre_id = str(channel.get("tv_genre_id", ""))
-                genre = all_genres_dict.get(genre_id, "")
-                logo = str(channel.get("logo", ""))
-                
-                cursor.execute('''
-                    INSERT INTO channels (
-                        portal, channel_id, portal_name, name, number, genre, logo,
-                        enabled, custom_name, custom_number, custom_genre, 
-                        custom_epg_id, fallback_channel, has_portal_epg
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, '', '', '', '', '', 0)
-                ''', (portal_id, channel_id, portal_name, channel_name, channel_number, genre, logo))
+            cursor.executemany('''
+                INSERT INTO channels (
+                    portal, channel_id, portal_name, name, number, genre, logo,
+                    enabled, custom_name, custom_number, custom_genre, 
+                    custom_epg_id, fallback_channel, has_portal_epg
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, 0, '', '', '', '', '', 0)
+            ''', (
+                (portal_id, channel_id, portal_name, str(channel.get("name", "")),
+                 str(channel.get("number", "")), channel_genres[channel_id] or "", str(channel.get("logo", "")))
+                for channel_id, channel in all_channels_map.items()
+            ))
             
             conn.commit()
             conn.close()
@@ -3254,14 +3816,9 @@ def portal_load_genres():
             logger.error(f"Error caching to database: {e}")
         
         # Count channels per genre
-        genre_counts = {}
-        for channel_id, channel in all_channels_map.items():
-            genre_id = str(channel.get("tv_genre_id", ""))
-            genre_name = all_genres_dict.get(genre_id, "Unknown")
-            
-            if genre_name not in genre_counts:
-                genre_counts[genre_name] = 0
-            genre_counts[genre_name] += 1
+        genre_counts = Counter(
+            "Unknown" if genre is None else genre for genre in channel_genres.values()
+        )
         
         # Get previously selected genres from database
         try:
@@ -3313,37 +3870,14 @@ def portal_save_genre_selection():
         
         # Fetch channels from ALL MACs and merge
         url = portal["url"]
-        macs = list(portal["macs"].keys())
+        macs = list(portal["macs"])
         proxy = portal["proxy"]
         portal_name = portal["name"]
         
-        all_channels_map = {}  # channel_id -> channel data
-        all_genres_dict = {}  # genre_id -> genre_name
-        
         logger.info(f"Saving genre selection: fetching from {len(macs)} MACs for portal {portal_name}")
         
-        for mac in macs:
-            try:
-                token = stb.getToken(url, mac, proxy)
-                if token:
-                    stb.getProfile(url, mac, token, proxy)
-                    mac_channels = stb.getAllChannels(url, mac, token, proxy)
-                    mac_genres = stb.getGenreNames(url, mac, token, proxy)
-                    
-                    if mac_channels:
-                        # Merge channels
-                        for channel in mac_channels:
-                            channel_id = str(channel["id"])
-                            if channel_id not in all_channels_map:
-                                all_channels_map[channel_id] = channel
-                        logger.info(f"MAC {mac}: Added {len(mac_channels)} channels (total: {len(all_channels_map)})")
-                    
-                    if mac_genres:
-                        all_genres_dict.update(mac_genres)
-                        
-            except Exception as e:
-                logger.error(f"Error fetching from MAC {mac}: {e}")
-                continue
+        # Usually served from the fetch made by /portal/load-genres moments before
+        all_channels_map, all_genres_dict = fetch_portal_channels(url, macs, proxy)
         
         if not all_channels_map or not all_genres_dict:
             return flask.jsonify({"error": "Failed to fetch channels from any MAC"}), 500
@@ -3356,32 +3890,30 @@ def portal_save_genre_selection():
         logger.info(f"Selected genres: {selected_genres}")
         logger.info(f"Processing {total_count} total channels from all MACs")
         
-        for channel_id, channel in all_channels_map.items():
-            genre_id = str(channel.get("tv_genre_id", ""))
-            genre = all_genres_dict.get(genre_id, "")
-            
+        # Resolve each channel's genre name once for both the selection and the DB insert
+        genre_name = all_genres_dict.get
+        channel_genres = {
+            channel_id: genre_name(str(channel.get("tv_genre_id", "")), "")
+            for channel_id, channel in all_channels_map.items()
+        }
+        
+        selected_set = set(selected_genres)
+        for channel_id, genre in channel_genres.items():
             # Enable channel if its genre is selected
-            if genre in selected_genres:
+            if genre in selected_set:
                 enabled_channels.append(channel_id)
                 enabled_count += 1
+        enabled_set = set(enabled_channels)
         
         logger.info(f"Enabled {enabled_count} channels out of {total_count}")
         logger.info(f"First 10 enabled channel IDs: {enabled_channels[:10]}")
         
-        # Update portal configuration
-        portals = getPortals()
+        # Update portal configuration (re-check - the portal may have been removed during the fetch)
         if portal_id in portals:
             portals[portal_id]["enabled channels"] = enabled_channels
             portals[portal_id]["selected genres"] = selected_genres  # Save selected genres
             savePortals(portals)
-            logger.info(f"Saved to portal config. Verifying...")
-            
-            # Verify it was saved
-            portals_verify = getPortals()
-            saved_count = len(portals_verify[portal_id].get("enabled channels", []))
-            saved_genres = portals_verify[portal_id].get("selected genres", [])
-            logger.info(f"Verification: {saved_count} channels in 'enabled channels' list")
-            logger.info(f"Verification: {len(saved_genres)} genres in 'selected genres' list")
+            logger.info(f"Saved {len(enabled_channels)} channels and {len(selected_genres)} genres to portal config")
             
             # Insert/Update channels in database
             try:
@@ -3393,28 +3925,21 @@ def portal_save_genre_selection():
                 logger.info(f"Deleted existing channels for portal {portal_id}")
                 
                 # Insert all channels into database
-                inserted_count = 0
-                for channel_id, channel in all_channels_map.items():
-                    channel_name = str(channel.get("name", ""))
-                    channel_number = str(channel.get("number", ""))
-                    genre_id = str(channel.get("tv_genre_id", ""))
-                    genre = all_genres_dict.get(genre_id, "")
-                    logo = str(channel.get("logo", ""))
-                    
-                    # Check if this channel should be enabled
-                    is_enabled = 1 if channel_id in enabled_channels else 0
-                    
-                    cursor.execute('''
-                        INSERT INTO channels (
-                            portal, channel_id, portal_name, name, number, genre, logo,
-                            enabled, custom_name, custom_number, custom_genre, 
-                            custom_epg_id, fallback_channel, has_portal_epg
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, '', '', '', '', '', 0)
-                    ''', (
-                        portal_id, channel_id, portal_name, channel_name, channel_number,
-                        genre, logo, is_enabled
-                    ))
-                    inserted_count += 1
+                cursor.executemany('''
+                    INSERT INTO channels (
+                        portal, channel_id, portal_name, name, number, genre, logo,
+                        enabled, custom_name, custom_number, custom_genre, 
+                        custom_epg_id, fallback_channel, has_portal_epg
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, '', '', '', '', '', 0)
+                ''', (
+                    (
+                        portal_id, channel_id, portal_name, str(channel.get("name", "")),
+                        str(channel.get("number", "")), channel_genres[channel_id],
+                        str(channel.get("logo", "")), 1 if channel_id in enabled_set else 0
+                    )
+                    for channel_id, channel in all_channels_map.items()
+                ))
+                inserted_count = len(all_channels_map)
                 
                 # Save selected genres to database
                 cursor.execute('DELETE FROM portal_genres WHERE portal = ?', (portal_id,))
@@ -3465,6 +3990,7 @@ def portalRemove():
         logger.error("Error deleting channels from database: {}".format(e))
     
     # Delete portal from config
+    invalidate_portal_channels(portals[id]["url"])
     del portals[id]
     savePortals(portals)
     
@@ -3488,6 +4014,17 @@ def generate_portal_m3u(portal_id):
     external_host, external_scheme = get_external_host_config()
     playlist_host = external_host or request.host or "0.0.0.0:8001"
     
+    # Playlist options are fixed for the whole run
+    settings = getSettings()
+    use_channel_numbers = settings.get("use channel numbers", "true") == "true"
+    use_channel_genres = settings.get("use channel genres", "true") == "true"
+    sort_by_name = settings.get("sort playlist by channel name", "true") == "true"
+    sort_by_number = settings.get("sort playlist by channel number", "false") == "true"
+    sort_by_genre = settings.get("sort playlist by channel genre", "false") == "true"
+    
+    def escape_quotes(text):
+        return str(text).replace('"', '&quot;') if text else ""
+    
     channels = []
     
     # Get enabled channels from database for specific portal
@@ -3515,6 +4052,8 @@ def generate_portal_m3u(portal_id):
         logger.warning(f"Portal {portal_id} is disabled")
         return "#EXTM3U \n"  # Return empty playlist for disabled portals
     
+    play_base = f"http://{playlist_host}/play/{portal_id}/"
+    
     # Get portal prefix
     portal_prefix = portals[portal_id].get("portal prefix", "").strip()
     
@@ -3532,50 +4071,36 @@ def generate_portal_m3u(portal_id):
             genre = f"[{portal_prefix}] {genre}"
         
         # Build M3U entry - escape quotes in attributes
-        def escape_quotes(text):
-            return str(text).replace('"', '&quot;') if text else ""
-        
-        m3u_entry = "#EXTINF:-1"
-        m3u_entry += ' tvg-id="' + escape_quotes(epg_id) + '"'
+        chno_attr = f' tvg-chno="{escape_quotes(channel_number)}"' if use_channel_numbers and channel_number else ""
+        genre_attr = f' group-title="{escape_quotes(genre)}"' if use_channel_genres and genre else ""
         
-        if getSettings().get("use channel numbers", "true") == "true" and channel_number:
-            m3u_entry += ' tvg-chno="' + escape_quotes(channel_number) + '"'
-        
-        if getSettings().get("use channel genres", "true") == "true" and genre:
-            m3u_entry += ' group-title="' + escape_quotes(genre) + '"'
+        m3u_entry = (
+            f'#EXTINF:-1 tvg-id="{escape_quotes(epg_id)}"{chno_attr}{genre_attr},{channel_name}\n'
+            f'{play_base}{channel_id}'
+        )
         
-        m3u_entry += ',' + str(channel_name) + "\n"
-        m3u_entry += "http://" + playlist_host + "/play/" + portal_id + "/" + channel_id
+        # Sort keys: channels without a number or genre go last
+        number_key = 999999
+        if chno_attr:
+            try:
+                number_key = int(escape_quotes(channel_number))
+            except ValueError:
+                pass
+        genre_key = escape_quotes(genre) if genre_attr else "zzz"
         
-        channels.append(m3u_entry)
+        channels.append((str(channel_name), number_key, genre_key, m3u_entry))
 
-    # Sort channels based on settings (same logic as main playlist)
-    if getSettings().get("sort playlist by channel name", "true") == "true":
-        channels.sort(key=lambda k: k.split(",")[1].split("\n")[0] if "," in k else "")
-    if getSettings().get("use channel numbers", "true") == "true":
-        if getSettings().get("sort playlist by channel number", "false") == "true":
-            def get_channel_number(k):
-                try:
-                    if 'tvg-chno="' in k:
-                        return int(k.split('tvg-chno="')[1].split('"')[0])
-                    return 999999  # Put channels without numbers at the end
-                except (ValueError, IndexError):
-                    return 999999
-            channels.sort(key=get_channel_number)
-    if getSettings().get("use channel genres", "true") == "true":
-        if getSettings().get("sort playlist by channel genre", "false") == "true":
-            def get_genre(k):
-                try:
-                    if 'group-title="' in k:
-                        return k.split('group-title="')[1].split('"')[0]
-                    return "zzz"  # Put channels without genre at the end
-                except IndexError:
-                    return "zzz"
-            channels.sort(key=get_genre)
+    # Sort channels based on settings; sorts are stable, so later keys keep the earlier order on ties
+    if sort_by_name:
+        channels.sort(key=itemgetter(0))
+    if use_channel_numbers and sort_by_number:
+        channels.sort(key=itemgetter(1))
+    if use_channel_genres and sort_by_genre:
+        channels.sort(key=itemgetter(2))
 
     playlist = "#EXTM3U \n"
     if channels:
-        playlist = playlist + "\n".join(channels)
+        playlist = playlist + "\n".join(channel[3] for channel in channels)
 
     logger.info(f"Generated M3U for portal {portal_id} with {len(channels)} channels")
     return playlist
@@ -3599,6 +4124,17 @@ def generate_portal_m3u_with_auth(portal_id, username=None, password=None):
     external_host, external_scheme = get_external_host_config()
     playlist_host = external_host or request.host or "0.0.0.0:8001"
     
+    # Playlist options are fixed for the whole run
+    settings = getSettings()
+    use_channel_numbers = settings.get("use channel numbers", "true") == "true"
+    use_channel_genres = settings.get("use channel genres", "true") == "true"
+    sort_by_name = settings.get("sort playlist by channel name", "true") == "true"
+    sort_by_number = settings.get("sort playlist by channel number", "false") == "true"
+    sort_by_genre = settings.get("sort playlist by channel genre", "false") == "true"
+    
+    def escape_quotes(text):
+        return str(text).replace('"', '&quot;') if text else ""
+    
     channels = []
     
     # Get enabled channels from database for specific portal
@@ -3626,9 +4162,14 @@ def generate_portal_m3u_with_auth(portal_id, username=None, password=None):
         logger.warning(f"Portal {portal_id} is disabled")
         return "#EXTM3U \n"  # Return empty playlist for disabled portals
     
-    # Get settings to determine if we should embed auth in stream URLs
-    settings = getSettings()
+    # Determine if we should embed auth in stream URLs
     security_enabled = settings.get("enable security", "false") == "true"
+    if security_enabled and username and password:
+        # Embed Basic Auth in stream URL for maximum player compatibility
+        play_base = f"http://{username}:{password}@{playlist_host}/play/{portal_id}/"
+    else:
+        # Standard stream URL without embedded auth
+        play_base = f"http://{playlist_host}/play/{portal_id}/"
     
     # Get portal prefix
     portal_prefix = portals[portal_id].get("portal prefix", "").strip()
@@ -3647,59 +4188,36 @@ def generate_portal_m3u_with_auth(portal_id, username=None, password=None):
             genre = f"[{portal_prefix}] {genre}"
         
         # Build M3U entry - escape quotes in attributes
-        def escape_quotes(text):
-            return str(text).replace('"', '&quot;') if text else ""
-        
-        m3u_entry = "#EXTINF:-1"
-        m3u_entry += ' tvg-id="' + escape_quotes(epg_id) + '"'
-        
-        if getSettings().get("use channel numbers", "true") == "true" and channel_number:
-            m3u_entry += ' tvg-chno="' + escape_quotes(channel_number) + '"'
+        chno_attr = f' tvg-chno="{escape_quotes(channel_number)}"' if use_channel_numbers and channel_number else ""
+        genre_attr = f' group-title="{escape_quotes(genre)}"' if use_channel_genres and genre else ""
         
-        if getSettings().get("use channel genres", "true") == "true" and genre:
-            m3u_entry += ' group-title="' + escape_quotes(genre) + '"'
-        
-        m3u_entry += ',' + str(channel_name) + "\n"
-        
-        # Generate stream URL with embedded auth if security is enabled and credentials provided
-        if security_enabled and username and password:
-            # Embed Basic Auth in stream URL for maximum player compatibility
-            stream_url = f"http://{username}:{password}@{playlist_host}/play/{portal_id}/{channel_id}"
-        else:
-            # Standard stream URL without embedded auth
-            stream_url = f"http://{playlist_host}/play/{portal_id}/{channel_id}"
+        m3u_entry = (
+            f'#EXTINF:-1 tvg-id="{escape_quotes(epg_id)}"{chno_attr}{genre_attr},{channel_name}\n'
+            f'{play_base}{channel_id}'
+        )
         
-        m3u_entry += stream_url
+        # Sort keys: channels without a number or genre go last
+        number_key = 999999
+        if chno_attr:
+            try:
+                number_key = int(escape_quotes(channel_number))
+            except ValueError:
+                pass
+        genre_key = escape_quotes(genre) if genre_attr else "zzz"
         
-        channels.append(m3u_entry)
+        channels.append((str(channel_name), number_key, genre_key, m3u_entry))
 
-    # Sort channels based on settings (same logic as main playlist)
-    if getSettings().get("sort playlist by channel name", "true") == "true":
-        channels.sort(key=lambda k: k.split(",")[1].split("\n")[0] if "," in k else "")
-    if getSettings().get("use channel numbers", "true") == "true":
-        if getSettings().get("sort playlist by channel number", "false") == "true":
-            def get_channel_number(k):
-                try:
-                    if 'tvg-chno="' in k:
-                        return int(k.split('tvg-chno="')[1].split('"')[0])
-                    return 999999  # Put channels without numbers at the end
-                except (ValueError, IndexError):
-                    return 999999
-            channels.sort(key=get_channel_number)
-    if getSettings().get("use channel genres", "true") == "true":
-        if getSettings().get("sort playlist by channel genre", "false") == "true":
-            def get_genre(k):
-                try:
-                    if 'group-title="' in k:
-                        return k.split('group-title="')[1].split('"')[0]
-                    return "zzz"  # Put channels without genre at the end
-                except IndexError:
-                    return "zzz"
-            channels.sort(key=get_genre)
+    # Sort channels based on settings; sorts are stable, so later keys keep the earlier order on ties
+    if sort_by_name:
+        channels.sort(key=itemgetter(0))
+    if use_channel_numbers and sort_by_number:
+        channels.sort(key=itemgetter(1))
+    if use_channel_genres and sort_by_genre:
+        channels.sort(key=itemgetter(2))
 
     playlist = "#EXTM3U \n"
     if channels:
-        playlist = playlist + "\n".join(channels)
+        playlist = playlist + "\n".join(channel[3] for channel in channels)
 
     logger.info(f"Generated M3U with auth for portal {portal_id} with {len(channels)} channels")
     return playlist
@@ -3735,9 +4253,6 @@ def portal_mac_status(portal_id):
         if not macs:
             return flask.jsonify({"success": False, "error": "No MAC addresses configured"}), 400
         
-        # Import MAC status checker
-        import requests
-        import json
         from datetime import datetime
         
         def check_single_mac_status(portal_url, mac_address):
@@ -3752,7 +4267,7 @@ def portal_mac_status(portal_id):
                 else:
                     portal_url_clean = portal_url
                 
-                session = requests.Session()
+                session = http_session
                 headers = {
                     'User-Agent': 'Mozilla/5.0 (QtEmbedded; U; Linux; C) AppleWebKit/533.3',
                     'X-User-Agent': f'Model: MAG250; Link: WiFi; MAC: {mac_address}',
@@ -3948,7 +4463,7 @@ def portal_download_m3u(portal_id):
         system_username = settings.get("username", "admin")
         system_password = settings.get("password", "12345")
         
-        if auth.username != system_username or auth.password != system_password:
+        if not credentials_match(auth.username, auth.password, system_username, system_password):
             logger.warning(f"Invalid Basic Auth credentials for legacy M3U: {auth.username}")
             response = Response(
                 'Invalid credentials\n'
@@ -4025,7 +4540,7 @@ def portal_specific_m3u(portal_id):
         system_username = settings.get("username", "admin")
         system_password = settings.get("password", "12345")
         
-        if auth.username != system_username or auth.password != system_password:
+        if not credentials_match(auth.username, auth.password, system_username, system_password):
             logger.warning(f"Invalid Basic Auth credentials for portal M3U: {auth.username}")
             response = Response(
                 'Invalid credentials\n'
@@ -4111,6 +4626,17 @@ def editor():
 def editor_data():
     """Get channel data from database cache."""
     try:
+        # Use external host configuration
+        external_host, external_scheme = get_external_host_config()
+        request_host = external_host or request.host
+        request_scheme = external_scheme if external_host else request.scheme
+        
+        # Editor re-polls are answered with 304 until the channels DB changes
+        etag = db_etag(request_scheme, request_host)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -4124,12 +4650,8 @@ def editor_data():
             ORDER BY portal_name, CAST(COALESCE(NULLIF(custom_number, ''), number) AS INTEGER)
         ''')
         
+        play_base = f"{request_scheme}://{request_host}/play/"
         channels = []
-        # Use external host configuration
-        external_host, external_scheme = get_external_host_config()
-        request_host = external_host or request.host
-        request_scheme = external_scheme if external_host else request.scheme
-        
         for row in cursor.fetchall():
             channels.append({
                 "portal": row['portal'],
@@ -4144,13 +4666,17 @@ def editor_data():
                 "channelId": row['channel_id'],
                 "customEpgId": row['custom_epg_id'] or '',
                 "fallbackChannel": row['fallback_channel'] or '',
-                "link": f"{request_scheme}://{request_host}/play/{row['portal']}/{row['channel_id']}?web=true",
+                "link": f"{play_base}{row['portal']}/{row['channel_id']}?web=true",
             })
         
         conn.close()
         
         logger.info(f"Returned {len(channels)} enabled channels from database cache")
-        return flask.jsonify({"data": channels})
+        # Full channel list can be several MB; serialize via orjson when available
+        response = json_response({"data": channels})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
         
     except Exception as e:
         logger.error(f"Error in editor_data: {e}")
@@ -4161,6 +4687,12 @@ def editor_data():
 def editor_portals():
     """Get list of unique portals for filter dropdown."""
     try:
+        # Dropdown re-opens are answered with 304 until the channels DB changes
+        etag = db_etag()
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -4175,7 +4707,10 @@ def editor_portals():
         conn.close()
         
         logger.info(f"Returning {len(portals)} portals from database")
-        return flask.jsonify({"portals": portals})
+        response = flask.jsonify({"portals": portals})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
     except Exception as e:
         logger.error(f"Error in editor_portals: {e}")
         return flask.jsonify({"portals": [], "error": str(e)}), 500
@@ -4186,6 +4721,12 @@ def editor_portals():
 def editor_genres():
     """Get list of unique genres for filter dropdown."""
     try:
+        # Dropdown re-opens are answered with 304 until the channels DB changes
+        etag = db_etag()
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -4202,7 +4743,10 @@ def editor_genres():
         conn.close()
         
         logger.info(f"Returning {len(genres)} genres from database")
-        return flask.jsonify({"genres": genres})
+        response = flask.jsonify({"genres": genres})
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
     except Exception as e:
         logger.error(f"Error in editor_genres: {e}")
         return flask.jsonify({"genres": [], "error": str(e)}), 500
@@ -4229,20 +4773,21 @@ def editor_portal_stats():
             ORDER BY portal_name
         """)
         
+        portal_rows = cursor.fetchall()
+        
+        # Count genres with at least one enabled channel for all portals in one
+        # grouped query instead of re-scanning the table once per portal
+        cursor.execute("""
+            SELECT portal, COUNT(DISTINCT COALESCE(NULLIF(custom_genre, ''), genre)) as enabled_genres
+            FROM channels
+            WHERE enabled = 1
+            GROUP BY portal
+        """)
+        enabled_genres = {row['portal']: row['enabled_genres'] for row in cursor.fetchall()}
+        
         portals = []
-        for row in cursor.fetchall():
-            # Get genre stats for this portal
-            cursor.execute("""
-                SELECT 
-                    COALESCE(NULLIF(custom_genre, ''), genre) as genre,
-                    COUNT(*) as total,
-                    SUM(CASE WHEN enabled = 1 THEN 1 ELSE 0 END) as enabled
-                FROM channels
-                WHERE portal = ?
-                GROUP BY COALESCE(NULLIF(custom_genre, ''), genre)
-            """, (row['portal'],))
-            
-            genres_with_enabled = sum(1 for g in cursor.fetchall() if g['enabled'] > 0)
+        for row in portal_rows:
+            genres_with_enabled = enabled_genres.get(row['portal'], 0)
             
             portals.append({
                 "id": row['portal'],
@@ -4276,20 +4821,22 @@ def editor_portal_channels(portal_id):
         
         cursor.execute("""
             SELECT 
-                portal, channel_id, portal_name, name, number, genre, logo,
-                custom_name, custom_number, custom_genre, custom_epg_id, 
-                fallback_channel, enabled
+                portal, channel_id, name, number, genre,
+                custom_name, custom_number, custom_genre, custom_epg_id, enabled
             FROM channels
             WHERE portal = ? OR portal_name = ?
             ORDER BY COALESCE(NULLIF(custom_genre, ''), genre), 
                      CAST(COALESCE(NULLIF(custom_number, ''), number) AS INTEGER)
         """, (portal_id, portal_id))
         
+        play_base = f"{request_scheme}://{request_host}/play/"
+        # Only the fields the editor table renders or edits; this endpoint
+        # returns every channel of a portal, so each extra key adds up
         channels = []
+        append = channels.append
         for row in cursor.fetchall():
-            channels.append({
+            append({
                 "portal": row['portal'],
-                "portalName": row['portal_name'] or '',
                 "channelId": row['channel_id'],
                 "channelName": row['name'] or '',
                 "customChannelName": row['custom_name'] or '',
@@ -4298,15 +4845,13 @@ def editor_portal_channels(portal_id):
                 "genre": row['genre'] or '',
                 "customGenre": row['custom_genre'] or '',
                 "customEpgId": row['custom_epg_id'] or '',
-                "fallbackChannel": row['fallback_channel'] or '',
                 "enabled": bool(row['enabled']),
-                "logo": row['logo'] or '',
-                "link": f"{request_scheme}://{request_host}/play/{row['portal']}/{row['channel_id']}?web=true",
+                "link": f"{play_base}{row['portal']}/{row['channel_id']}?web=true",
             })
         
         conn.close()
         logger.info(f"Returning {len(channels)} channels for portal {portal_id}")
-        return flask.jsonify({"channels": channels})
+        return json_response({"channels": channels})
     except Exception as e:
         logger.error(f"Error in editor_portal_channels: {e}")
         return flask.jsonify({"channels": [], "error": str(e)}), 500
@@ -4315,17 +4860,18 @@ def editor_portal_channels(portal_id):
 @app.route("/editor/save", methods=["POST"])
 @authorise
 def editorSave():
-    global cached_xmltv, last_playlist_host
-    threading.Thread(target=refresh_xmltv, daemon=True).start()
-    last_playlist_host = None
-    Thread(target=refresh_lineup).start()
-    
-    enabledEdits = json.loads(request.form["enabledEdits"])
-    numberEdits = json.loads(request.form["numberEdits"])
-    nameEdits = json.loads(request.form["nameEdits"])
-    genreEdits = json.loads(request.form["genreEdits"])
-    epgEdits = json.loads(request.form["epgEdits"])
-    fallbackEdits = json.loads(request.form["fallbackEdits"])
+    global cached_playlist
+    
+    form = request.form
+    try:
+        enabledEdits, numberEdits, nameEdits, genreEdits, epgEdits, fallbackEdits = (
+            json_loads(form[key])
+            for key in ("enabledEdits", "numberEdits", "nameEdits", "genreEdits", "epgEdits", "fallbackEdits")
+        )
+    except (KeyError, ValueError) as e:
+        logger.error(f"Invalid editor save payload: {e}")
+        flash(f"Error saving changes: invalid payload ({e})", "danger")
+        return redirect("/editor", code=302)
     
     # Update SQLite database
     conn = get_db_connection()
@@ -4333,80 +4879,38 @@ def editorSave():
     
     try:
         # Process enabled/disabled edits
-        for edit in enabledEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            enabled = 1 if edit["enabled"] else 0
-            
-            cursor.execute('''
-                UPDATE channels 
-                SET enabled = ? 
-                WHERE portal = ? AND channel_id = ?
-            ''', (enabled, portal, channel_id))
-        
-        # Process custom number edits
-        for edit in numberEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            custom_number = edit["custom number"]
-            
-            cursor.execute('''
-                UPDATE channels 
-                SET custom_number = ? 
-                WHERE portal = ? AND channel_id = ?
-            ''', (custom_number, portal, channel_id))
-        
-        # Process custom name edits
-        for edit in nameEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            custom_name = edit["custom name"]
-            
-            cursor.execute('''
-                UPDATE channels 
-                SET custom_name = ? 
-                WHERE portal = ? AND channel_id = ?
-            ''', (custom_name, portal, channel_id))
-        
-        # Process custom genre edits
-        for edit in genreEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            custom_genre = edit["custom genre"]
-            
-            cursor.execute('''
-                UPDATE channels 
-                SET custom_genre = ? 
-                WHERE portal = ? AND channel_id = ?
-            ''', (custom_genre, portal, channel_id))
-        
-        # Process custom EPG ID edits
-        for edit in epgEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            custom_epg_id = edit["custom epg id"]
-            
-            cursor.execute('''
-                UPDATE channels 
-                SET custom_epg_id = ? 
-                WHERE portal = ? AND channel_id = ?
-            ''', (custom_epg_id, portal, channel_id))
-        
-        # Process fallback channel edits
-        for edit in fallbackEdits:
-            portal = edit["portal"]
-            channel_id = edit["channel id"]
-            fallback_channel = edit["channel name"]
-            
-            cursor.execute('''
+        cursor.executemany('''
+            UPDATE channels 
+            SET enabled = ? 
+            WHERE portal = ? AND channel_id = ?
+        ''', [(1 if edit["enabled"] else 0, edit["portal"], edit["channel id"]) for edit in enabledEdits])
+        
+        # Process custom field edits (column, payload key, edits); one batched
+        # statement per column instead of a round-trip per edited channel
+        custom_edits = (
+            ("custom_number", "custom number", numberEdits),
+            ("custom_name", "custom name", nameEdits),
+            ("custom_genre", "custom genre", genreEdits),
+            ("custom_epg_id", "custom epg id", epgEdits),
+            ("fallback_channel", "channel name", fallbackEdits),
+        )
+        for column, key, edits in custom_edits:
+            if not edits:
+                continue
+            cursor.executemany(f'''
                 UPDATE channels 
-                SET fallback_channel = ? 
+                SET {column} = ? 
                 WHERE portal = ? AND channel_id = ?
-            ''', (fallback_channel, portal, channel_id))
+            ''', [(edit[key], edit["portal"], edit["channel id"]) for edit in edits])
         
         conn.commit()
         logger.info("Channel edits saved to database!")
         
+        # Rebuild caches only once the edits are committed
+        cached_playlist = None
+        schedule_refresh(refresh_xmltv)
+        schedule_refresh(refresh_lineup)
+        
     except Exception as e:
         conn.rollback()
         logger.error(f"Error saving channel edits: {e}")
@@ -4463,14 +4967,13 @@ def editor_bulk_edit():
         cursor.execute('SELECT portal, channel_id, name, custom_name, genre, custom_genre FROM channels')
         channels = cursor.fetchall()
         
-        import json
-        channels_backup = json.dumps([dict(ch) for ch in channels])
+        channels_backup = json_dumps([dict(ch) for ch in channels]).decode()
         
         # Save to history
         cursor.execute('''
             INSERT INTO bulk_edit_history (timestamp, rules, apply_to_names, apply_to_genres, channels_backup)
             VALUES (datetime('now'), ?, ?, ?, ?)
-        ''', (json.dumps(rules), 1 if apply_to_names else 0, 1 if apply_to_genres else 0, channels_backup))
+        ''', (json_dumps(rules).decode(), 1 if apply_to_names else 0, 1 if apply_to_genres else 0, channels_backup))
         
         # Save individual rules for persistence
         for rule in rules:
@@ -4595,9 +5098,9 @@ def editor_bulk_edit():
         conn.close()
         
         # Refresh playlist and EPG (XC API queries database directly, so no separate cache to clear)
-        global cached_xmltv, last_playlist_host
-        last_playlist_host = None  # Force M3U playlist regeneration
-        threading.Thread(target=refresh_xmltv, daemon=True).start()  # Refresh EPG
+        global cached_playlist
+        cached_playlist = None  # Force M3U playlist regeneration
+        schedule_refresh(refresh_xmltv)  # Refresh EPG
         
         logger.info(f"Bulk edit applied: {updated_count} channels updated")
         
@@ -4630,8 +5133,7 @@ def editor_bulk_edit_undo():
         if not history:
             return flask.jsonify({"success": False, "error": "No history to undo"}), 400
         
-        import json
-        channels_backup = json.loads(history['channels_backup'])
+        channels_backup = json_loads(history['channels_backup'])
         
         # Restore channels from backup
         for channel in channels_backup:
@@ -4649,9 +5151,9 @@ def editor_bulk_edit_undo():
         conn.close()
         
         # Refresh playlist and EPG
-        global cached_xmltv, last_playlist_host
-        last_playlist_host = None
-        threading.Thread(target=refresh_xmltv, daemon=True).start()
+        global cached_playlist
+        cached_playlist = None
+        schedule_refresh(refresh_xmltv)
         
         logger.info("Bulk edit undone successfully")
         
@@ -4681,10 +5183,9 @@ def editor_bulk_edit_history():
         history = cursor.fetchall()
         conn.close()
         
-        import json
         history_list = []
         for entry in history:
-            rules = json.loads(entry['rules'])
+            rules = json_loads(entry['rules'])
             history_list.append({
                 'id': entry['id'],
                 'timestamp': entry['timestamp'],
@@ -4778,9 +5279,9 @@ def editor_reset_all_customizations():
         conn.close()
         
         # Refresh playlist and EPG
-        global cached_xmltv, last_playlist_host
-        last_playlist_host = None
-        threading.Thread(target=refresh_xmltv, daemon=True).start()
+        global cached_playlist
+        cached_playlist = None
+        schedule_refresh(refresh_xmltv)
         
         logger.info("All customizations reset to original values")
         
@@ -4810,10 +5311,16 @@ def editorReset():
                 custom_genre = '',
                 custom_epg_id = '',
                 fallback_channel = ''
+            WHERE enabled != 0
+                OR COALESCE(custom_name, '') != ''
+                OR COALESCE(custom_number, '') != ''
+                OR COALESCE(custom_genre, '') != ''
+                OR COALESCE(custom_epg_id, '') != ''
+                OR COALESCE(fallback_channel, '') != ''
         ''')
         
         conn.commit()
-        logger.info("All channel customizations reset!")
+        logger.info(f"All channel customizations reset! ({cursor.rowcount} channels changed)")
         flash("Playlist reset!", "success")
         
     except Exception as e:
@@ -4870,51 +5377,41 @@ def editor_deactivate_duplicates():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Find all duplicate channels (using ROW_NUMBER to identify which to keep)
-        find_duplicates_query = """
-            WITH ranked_channels AS (
-                SELECT 
-                    portal,
-                    channel_id,
-                    COALESCE(NULLIF(custom_name, ''), name) as effective_name,
-                    ROW_NUMBER() OVER (
-                        PARTITION BY COALESCE(NULLIF(custom_name, ''), name) 
-                        ORDER BY portal, channel_id
-                    ) as row_num
-                FROM channels
-                WHERE enabled = 1
-            )
-            SELECT portal, channel_id, effective_name, row_num
-            FROM ranked_channels
-            WHERE effective_name IN (
-                SELECT effective_name
-                FROM ranked_channels
-                GROUP BY effective_name
-                HAVING COUNT(*) > 1
-            )
-            AND row_num > 1
-            ORDER BY effective_name, row_num
-        """
+        # Keep the first occurrence (by portal, channel_id) of every effective
+        # name; names are compared stripped and casefolded so "ORF 1" and
+        # "orf 1 " count as duplicates
+        cursor.execute("""
+            SELECT portal, channel_id, COALESCE(NULLIF(custom_name, ''), name) as effective_name
+            FROM channels
+            WHERE enabled = 1
+            ORDER BY portal, channel_id
+        """)
         
-        cursor.execute(find_duplicates_query)
-        duplicates_to_deactivate = cursor.fetchall()
+        seen_names = set()
+        duplicates_to_deactivate = []
+        for row in cursor.fetchall():
+            name = (row['effective_name'] or '').strip().casefold()
+            if not name:
+                continue
+            if name in seen_names:
+                duplicates_to_deactivate.append((row['portal'], row['channel_id']))
+            else:
+                seen_names.add(name)
         
         # Deactivate the duplicate channels
-        deactivated_count = 0
-        for dup in duplicates_to_deactivate:
-            cursor.execute("""
-                UPDATE channels
-                SET enabled = 0
-                WHERE portal = ? AND channel_id = ?
-            """, (dup['portal'], dup['channel_id']))
-            deactivated_count += 1
+        cursor.executemany("""
+            UPDATE channels
+            SET enabled = 0
+            WHERE portal = ? AND channel_id = ?
+        """, duplicates_to_deactivate)
+        deactivated_count = len(duplicates_to_deactivate)
         
         conn.commit()
         conn.close()
         
         # Reset playlist cache to force regeneration
-        global last_playlist_host
-        last_playlist_host = None
+        global cached_playlist
+        cached_playlist = None
         
         logger.info(f"Deactivated {deactivated_count} duplicate channels")
         
@@ -4969,7 +5466,7 @@ def save():
 
     saveSettings(settings)
     logger.info("Settings saved!")
-    Thread(target=refresh_xmltv).start()
+    schedule_refresh(refresh_xmltv)
     flash("Settings saved!", "success")
     return redirect("/settings", code=302)
 
@@ -4988,13 +5485,34 @@ def xc_users_page():
 @app.route("/xc-users/list", methods=["GET"])
 @authorise
 def xc_users_list():
-    """Get list of XC users."""
-    users = getXCUsers()
-    user_list = []
-    
+    """Get list of XC users.
+
+    Optional query args: q (username substring), enabled ("true"/"false") and
+    page/per_page. Without page/per_page every matching user is returned, which
+    is what the XC users page expects for its client-side filters and stats.
+    """
+    users = getXCUsers()
+    query = request.args.get("q", "").strip().lower()
+    enabled_filter = request.args.get("enabled")
+    paginate = "page" in request.args or "per_page" in request.args
+    page = max(request.args.get("page", 1, type=int) or 1, 1)
+    per_page = min(max(request.args.get("per_page", 50, type=int) or 50, 1), 500)
+
     # Create a copy to avoid RuntimeError if dictionary changes during iteration
-    for user_id, user in list(users.items()):
-        active_cons = len(user.get("active_connections", {}))
+    matching = [
+        (user_id, user) for user_id, user in list(users.items())
+        if (not query or query in str(user.get("username", "")).lower())
+        and (enabled_filter is None or (user.get("enabled") == "true") == (enabled_filter == "true"))
+    ]
+    total = len(matching)
+    if paginate:
+        start = (page - 1) * per_page
+        matching = itertools.islice(matching, start, start + per_page)
+
+    # Only the returned slice gets its connection count and response dict
+    user_list = []
+    for user_id, user in matching:
+        active_cons = countXCConnections(user_id)
         user_list.append({
             "id": user_id,
             "username": user.get("username"),
@@ -5004,10 +5522,15 @@ def xc_users_list():
             "active_connections": active_cons,
             "allowed_portals": user.get("allowed_portals", []),
             "created_at": user.get("created_at"),
-            "expires_at": user.get("expires_at")
+            "expires_at": user.get("expires_at"),
+            "legacy_key": bool(user.get("legacy_key"))
         })
-    
-    return flask.jsonify({"users": user_list})
+
+    payload = {"users": user_list, "total": total}
+    if paginate:
+        payload["page"] = page
+        payload["per_page"] = per_page
+    return json_response(payload)
 
 
 @app.route("/xc-users/add", methods=["POST"])
@@ -5020,13 +5543,13 @@ def xc_users_add():
         password = data.get("password", "").strip()
         
         if not username or not password:
-            return flask.jsonify({"error": "Username and password required"}), 400
+            return json_response({"error": "Username and password required"}), 400
         
         users = getXCUsers()
-        user_id = f"{username}_{password}"
+        user_id = username
         
         if user_id in users:
-            return flask.jsonify({"error": "User already exists"}), 400
+            return json_response({"error": "User already exists"}), 400
         
         users[user_id] = {
             "username": username,
@@ -5035,16 +5558,15 @@ def xc_users_add():
             "max_connections": str(data.get("max_connections", 1)),
             "allowed_portals": data.get("allowed_portals", []),
             "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "expires_at": data.get("expires_at", ""),
-            "active_connections": {}
+            "expires_at": data.get("expires_at", "")
         }
         
         saveXCUsers(users)
         logger.info(f"XC user created: {username}")
-        return flask.jsonify({"success": True, "user_id": user_id})
+        return json_response({"success": True, "user_id": user_id})
     except Exception as e:
         logger.error(f"Error adding XC user: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/xc-users/update", methods=["POST"])
@@ -5056,12 +5578,16 @@ def xc_users_update():
         user_id = data.get("user_id")
         
         if not user_id:
-            return flask.jsonify({"error": "User ID required"}), 400
+            return json_response({"error": "User ID required"}), 400
         
         users = getXCUsers()
         if user_id not in users:
-            return flask.jsonify({"error": "User not found"}), 404
+            return json_response({"error": "User not found"}), 404
         
+        # The user id never changes with the password, so active connections are kept
+        password = (data.get("password") or "").strip()
+        if password:
+            users[user_id]["password"] = password
         users[user_id]["enabled"] = "true" if data.get("enabled") else "false"
         users[user_id]["max_connections"] = str(data.get("max_connections", 1))
         users[user_id]["allowed_portals"] = data.get("allowed_portals", [])
@@ -5069,10 +5595,10 @@ def xc_users_update():
         
         saveXCUsers(users)
         logger.info(f"XC user updated: {user_id}")
-        return flask.jsonify({"success": True})
+        return json_response({"success": True})
     except Exception as e:
         logger.error(f"Error updating XC user: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/xc-users/delete", methods=["POST"])
@@ -5084,21 +5610,21 @@ def xc_users_delete():
         user_id = data.get("user_id")
         
         if not user_id:
-            return flask.jsonify({"error": "User ID required"}), 400
+            return json_response({"error": "User ID required"}), 400
         
         users = getXCUsers()
         if user_id not in users:
-            return flask.jsonify({"error": "User not found"}), 404
+            return json_response({"error": "User not found"}), 404
         
         username = users[user_id].get("username")
         del users[user_id]
         saveXCUsers(users)
         
         logger.info(f"XC user deleted: {username}")
-        return flask.jsonify({"success": True})
+        return json_response({"success": True})
     except Exception as e:
         logger.error(f"Error deleting XC user: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/xc-users/kick", methods=["POST"])
@@ -5111,14 +5637,14 @@ def xc_users_kick():
         device_id = data.get("device_id")
         
         if not user_id or not device_id:
-            return flask.jsonify({"error": "User ID and device ID required"}), 400
+            return json_response({"error": "User ID and device ID required"}), 400
         
         unregisterXCConnection(user_id, device_id)
         logger.info(f"Kicked connection: {user_id}/{device_id}")
-        return flask.jsonify({"success": True})
+        return json_response({"success": True})
     except Exception as e:
         logger.error(f"Error kicking connection: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/playlist.m3u", methods=["GET"])
@@ -5144,7 +5670,7 @@ def playlist():
             system_username = settings.get("username", "admin")
             system_password = settings.get("password", "12345")
             
-            if auth.username == system_username and auth.password == system_password:
+            if credentials_match(auth.username, auth.password, system_username, system_password):
                 # Basic Auth successful - generate playlist with embedded auth
                 logger.info(f"Basic Auth successful for main playlist: {auth.username}")
                 return _playlist_with_auth(auth.username, auth.password)
@@ -5166,20 +5692,32 @@ def playlist():
             return authorise(lambda: _playlist())()
 
 def _playlist():
-    global cached_playlist, last_playlist_host
-    
     logger.info("Playlist Requested")
     
     # Use external host configuration
     external_host, external_scheme = get_external_host_config()
     current_host = external_host or request.host or "0.0.0.0:8001"
     
-    if cached_playlist is None or len(cached_playlist) == 0 or last_playlist_host != current_host:
-        logger.info(f"Regenerating playlist due to host change: {last_playlist_host} -> {current_host}")
-        last_playlist_host = current_host
-        generate_playlist()
-
-    return Response(cached_playlist, mimetype="text/plain")
+    cached = cached_playlist
+    if not cached:
+        # Double-checked: concurrent requests on a cold cache wait for one rebuild
+        with _playlist_lock:
+            if not cached_playlist:
+                generate_playlist()
+            cached = cached_playlist
+    template, template_etag = cached
+    
+    # The cached playlist is host-independent; clients reaching the server under
+    # different names (LAN/WAN, IPv4/IPv6) only cost a str.replace each
+    key = (template_etag, current_host)
+    body = playlist_host_bodies.get(key)
+    if body is None:
+        body = template.replace(PLAYLIST_HOST_PLACEHOLDER, current_host)
+        if len(playlist_host_bodies) >= 16:
+            playlist_host_bodies.clear()
+        playlist_host_bodies[key] = body
+    
+    return cached_body_response(body, f"{template_etag}-{content_etag(current_host)}", "text/plain")
 
 def _playlist_with_auth(username, password):
     """Generate playlist with embedded Basic Auth credentials in stream URLs."""
@@ -5193,6 +5731,20 @@ def _playlist_with_auth(username, password):
         # Use the actual request host (e.g., rico.goip.de:61095)
         playlist_host = request.host or "0.0.0.0:8001"
     
+    # Playlist options are fixed for the whole run
+    settings = getSettings()
+    use_channel_numbers = settings.get("use channel numbers", "true") == "true"
+    use_channel_genres = settings.get("use channel genres", "true") == "true"
+    sort_by_name = settings.get("sort playlist by channel name", "true") == "true"
+    sort_by_number = settings.get("sort playlist by channel number", "false") == "true"
+    sort_by_genre = settings.get("sort playlist by channel genre", "false") == "true"
+    
+    def escape_quotes(text):
+        return str(text).replace('"', '&quot;') if text else ""
+    
+    # Embed Basic Auth credentials in stream URLs
+    play_base = f"http://{username}:{password}@{playlist_host}/play/"
+    
     channels = []
     
     # Get enabled channels from database
@@ -5229,51 +5781,36 @@ def _playlist_with_auth(username, password):
         portal_name = portals[portal_id].get("name", portal_id)
         
         # Build M3U entry - escape quotes in attributes
-        def escape_quotes(text):
-            return str(text).replace('"', '&quot;') if text else ""
-        
-        m3u_entry = "#EXTINF:-1"
-        m3u_entry += ' tvg-id="' + escape_quotes(epg_id) + '"'
-        
-        if getSettings().get("use channel numbers", "true") == "true" and channel_number:
-            m3u_entry += ' tvg-chno="' + escape_quotes(channel_number) + '"'
+        chno_attr = f' tvg-chno="{escape_quotes(channel_number)}"' if use_channel_numbers and channel_number else ""
         
         # Always use portal name as group-title for playlist.m3u
-        m3u_entry += ' group-title="' + escape_quotes(portal_name) + '"'
+        m3u_entry = (
+            f'#EXTINF:-1 tvg-id="{escape_quotes(epg_id)}"{chno_attr} group-title="{escape_quotes(portal_name)}",{channel_name}\n'
+            f'{play_base}{portal_id}/{channel_id}'
+        )
         
-        m3u_entry += ',' + str(channel_name) + "\n"
-        # Embed Basic Auth credentials in stream URL
-        m3u_entry += f"http://{username}:{password}@{playlist_host}/play/{portal_id}/{channel_id}"
+        # Sort keys: channels without a number or genre go last
+        number_key = 999999
+        if chno_attr:
+            try:
+                number_key = int(escape_quotes(channel_number))
+            except ValueError:
+                pass
+        genre_key = escape_quotes(portal_name)
         
-        channels.append(m3u_entry)
+        channels.append((str(channel_name), number_key, genre_key, m3u_entry))
 
-    # Sort channels based on settings (same logic as generate_playlist)
-    if getSettings().get("sort playlist by channel name", "true") == "true":
-        channels.sort(key=lambda k: k.split(",")[1].split("\n")[0] if "," in k else "")
-    if getSettings().get("use channel numbers", "true") == "true":
-        if getSettings().get("sort playlist by channel number", "false") == "true":
-            def get_channel_number(k):
-                try:
-                    if 'tvg-chno="' in k:
-                        return int(k.split('tvg-chno="')[1].split('"')[0])
-                    return 999999  # Put channels without numbers at the end
-                except (ValueError, IndexError):
-                    return 999999
-            channels.sort(key=get_channel_number)
-    if getSettings().get("use channel genres", "true") == "true":
-        if getSettings().get("sort playlist by channel genre", "false") == "true":
-            def get_genre(k):
-                try:
-                    if 'group-title="' in k:
-                        return k.split('group-title="')[1].split('"')[0]
-                    return "zzz"  # Put channels without genre at the end
-                except IndexError:
-                    return "zzz"
-            channels.sort(key=get_genre)
+    # Sort channels based on settings; sorts are stable, so later keys keep the earlier order on ties
+    if sort_by_name:
+        channels.sort(key=itemgetter(0))
+    if use_channel_numbers and sort_by_number:
+        channels.sort(key=itemgetter(1))
+    if use_channel_genres and sort_by_genre:
+        channels.sort(key=itemgetter(2))
 
     playlist = "#EXTM3U \n"
     if channels:
-        playlist = playlist + "\n".join(channels)
+        playlist = playlist + "\n".join(channel[3] for channel in channels)
 
     logger.info("Playlist with Basic Auth generated.")
     return Response(playlist, mimetype="text/plain")
@@ -5325,10 +5862,19 @@ def generate_playlist():
     global cached_playlist
     logger.info("Generating playlist.m3u from database...")
 
-    # Use external host configuration
-    external_host, external_scheme = get_external_host_config()
-    playlist_host = external_host or request.host or "0.0.0.0:8001"
+    # Playlist options are fixed for the whole run
+    settings = getSettings()
+    use_channel_numbers = settings.get("use channel numbers", "true") == "true"
+    use_channel_genres = settings.get("use channel genres", "true") == "true"
+    sort_by_name = settings.get("sort playlist by channel name", "true") == "true"
+    sort_by_number = settings.get("sort playlist by channel number", "false") == "true"
+    sort_by_genre = settings.get("sort playlist by channel genre", "false") == "true"
+    
+    def escape_quotes(text):
+        return str(text).replace('"', '&quot;') if text else ""
     
+    # The host is filled in per request by _playlist()
+    play_base = f"http://{PLAYLIST_HOST_PLACEHOLDER}/play/"
     channels = []
     
     # Get enabled channels from database
@@ -5367,52 +5913,38 @@ def generate_playlist():
             genre = f"[{portal_prefix}] {genre}"
         
         # Build M3U entry - escape quotes in attributes
-        def escape_quotes(text):
-            return str(text).replace('"', '&quot;') if text else ""
-        
-        m3u_entry = "#EXTINF:-1"
-        m3u_entry += ' tvg-id="' + escape_quotes(epg_id) + '"'
-        
-        if getSettings().get("use channel numbers", "true") == "true" and channel_number:
-            m3u_entry += ' tvg-chno="' + escape_quotes(channel_number) + '"'
+        chno_attr = f' tvg-chno="{escape_quotes(channel_number)}"' if use_channel_numbers and channel_number else ""
+        genre_attr = f' group-title="{escape_quotes(genre)}"' if use_channel_genres and genre else ""
         
-        if getSettings().get("use channel genres", "true") == "true" and genre:
-            m3u_entry += ' group-title="' + escape_quotes(genre) + '"'
+        entry = (
+            f'#EXTINF:-1 tvg-id="{escape_quotes(epg_id)}"{chno_attr}{genre_attr},{channel_name}\n'
+            f'{play_base}{portal_id}/{channel_id}'
+        )
         
-        m3u_entry += ',' + str(channel_name) + "\n"
-        m3u_entry += "http://" + playlist_host + "/play/" + portal_id + "/" + channel_id
+        # Sort keys: channels without a number or genre go last
+        number_key = 999999
+        if chno_attr:
+            try:
+                number_key = int(escape_quotes(channel_number))
+            except ValueError:
+                pass
+        genre_key = escape_quotes(genre) if genre_attr else "zzz"
         
-        channels.append(m3u_entry)
+        channels.append((str(channel_name), number_key, genre_key, entry))
 
-    # Sort channels based on settings
-    if getSettings().get("sort playlist by channel name", "true") == "true":
-        channels.sort(key=lambda k: k.split(",")[1].split("\n")[0] if "," in k else "")
-    if getSettings().get("use channel numbers", "true") == "true":
-        if getSettings().get("sort playlist by channel number", "false") == "true":
-            def get_channel_number(k):
-                try:
-                    if 'tvg-chno="' in k:
-                        return int(k.split('tvg-chno="')[1].split('"')[0])
-                    return 999999  # Put channels without numbers at the end
-                except (ValueError, IndexError):
-                    return 999999
-            channels.sort(key=get_channel_number)
-    if getSettings().get("use channel genres", "true") == "true":
-        if getSettings().get("sort playlist by channel genre", "false") == "true":
-            def get_genre(k):
-                try:
-                    if 'group-title="' in k:
-                        return k.split('group-title="')[1].split('"')[0]
-                    return "zzz"  # Put channels without genre at the end
-                except IndexError:
-                    return "zzz"
-            channels.sort(key=get_genre)
+    # Sort channels based on settings; sorts are stable, so later keys keep the earlier order on ties
+    if sort_by_name:
+        channels.sort(key=itemgetter(0))
+    if use_channel_numbers and sort_by_number:
+        channels.sort(key=itemgetter(1))
+    if use_channel_genres and sort_by_genre:
+        channels.sort(key=itemgetter(2))
 
     playlist = "#EXTM3U \n"
     if channels:
-        playlist = playlist + "\n".join(channels)
+        playlist = playlist + "\n".join(channel[3] for channel in channels)
 
-    cached_playlist = playlist
+    cached_playlist = (playlist, content_etag(playlist))
     logger.info("Playlist generated and cached.")
     
 def normalize_channel_name(name):
@@ -5431,9 +5963,25 @@ def normalize_channel_name(name):
     return name
 
 
-def find_best_epg_match(channel_name, fallback_data):
+def build_epg_match_index(fallback_data):
+    """Normalize the fallback channel names once for repeated find_best_epg_match calls.
+
+    Returns:
+        tuple: (normalized name -> first channel_id, name length -> [(position, normalized name, channel_id)])
+    """
+    exact = {}
+    by_length = defaultdict(list)
+    for position, (fb_name, fb_data) in enumerate(fallback_data.items()):
+        normalized_fb = normalize_channel_name(fb_name)
+        exact.setdefault(normalized_fb, fb_data['channel_id'])
+        by_length[len(normalized_fb)].append((position, normalized_fb, fb_data['channel_id']))
+    return exact, by_length
+
+
+def find_best_epg_match(channel_name, fallback_data, index=None):
     """Find best EPG match using normalized names with VERY strict matching rules.
-    Returns None if no confident match is found - better no EPG than wrong EPG."""
+    Returns None if no confident match is found - better no EPG than wrong EPG.
+    Pass index=build_epg_match_index(fallback_data) when matching many channels."""
     if not channel_name or not fallback_data:
         return None
     
@@ -5441,21 +5989,30 @@ def find_best_epg_match(channel_name, fallback_data):
     if not normalized_search:
         return None
     
-    # Try exact match first - this is the only 100% confident match
-    for fb_name, fb_data in fallback_data.items():
-        if normalize_channel_name(fb_name) == normalized_search:
-            return fb_data['channel_id']
+    exact, by_length = index or build_epg_match_index(fallback_data)
     
-    # Try substring match - but ONLY if it's a very strong match (80% similarity)
-    for fb_name, fb_data in fallback_data.items():
-        normalized_fb = normalize_channel_name(fb_name)
-        # Increased threshold to 80% to be more conservative
-        if normalized_search in normalized_fb:
-            if len(normalized_search) >= len(normalized_fb) * 0.8:
-                return fb_data['channel_id']
-        elif normalized_fb in normalized_search:
-            if len(normalized_fb) >= len(normalized_search) * 0.8:
-                return fb_data['channel_id']
+    # Try exact match first - this is the only 100% confident match
+    if normalized_search in exact:
+        return exact[normalized_search]
+    
+    # Try substring match - but ONLY if it's a very strong match (80% similarity).
+    # Either name must be at least 80% of the other's length, so only names within
+    # that length window can match; the earliest matching fallback entry wins.
+    search_len = len(normalized_search)
+    best = None
+    for fb_len in range(math.ceil(search_len * 0.8), int(search_len / 0.8) + 1):
+        for position, normalized_fb, channel_id in by_length.get(fb_len, ()):
+            if best is not None and position >= best[0]:
+                break
+            # Increased threshold to 80% to be more conservative
+            if normalized_search in normalized_fb:
+                if search_len >= fb_len * 0.8:
+                    best = (position, channel_id)
+            elif normalized_fb in normalized_search:
+                if fb_len >= search_len * 0.8:
+                    best = (position, channel_id)
+    if best is not None:
+        return best[1]
     
     # Word-by-word matching is now DISABLED by default
     # It causes too many false positives
@@ -5501,6 +6058,7 @@ def find_best_epg_match(channel_name, fallback_data):
 def fetch_epgshare_fallback(countries):
     """Fetch EPG data from epgshare01.online for specified countries."""
     fallback_programmes = {}
+    programmes_by_channel_id = {}  # channel_id -> first fallback_programmes entry with that id
     base_url = "https://epgshare01.online/epgshare01/"
     
     # Country code mapping
@@ -5554,46 +6112,60 @@ def fetch_epgshare_fallback(countries):
             url = base_url + country_files[country]
             logger.info(f"Fetching EPG fallback for {country} from {url}")
             
-            response = requests.get(url, timeout=60)
-            if response.status_code == 200:
-                # Decompress gzip
-                with gzip.GzipFile(fileobj=io.BytesIO(response.content)) as f:
-                    xml_content = f.read().decode('utf-8')
-                
-                # Parse XML
-                root = ET.fromstring(xml_content)
-                
-                # Extract channel mappings and programmes
-                for channel in root.findall('channel'):
-                    channel_id = channel.get('id', '')
-                    display_name = channel.find('display-name')
-                    if display_name is not None and display_name.text:
-                        # Store by display name (lowercase for matching)
-                        name_key = display_name.text.lower().strip()
-                        if name_key not in fallback_programmes:
-                            fallback_programmes[name_key] = {
-                                'channel_id': channel_id,
-                                'programmes': []
-                            }
+            # Stream download -> gunzip -> parse, so only one programme is held in memory at a time
+            with http_session.get(url, timeout=60, stream=True) as response:
+                if response.status_code != 200:
+                    logger.warning(f"EPG fallback for {country} returned HTTP {response.status_code}")
+                    continue
                 
-                for programme in root.findall('programme'):
-                    channel_id = programme.get('channel', '')
-                    # Find matching channel name
-                    for name_key, data in fallback_programmes.items():
-                        if data['channel_id'] == channel_id:
-                            data['programmes'].append({
-                                'start': programme.get('start', ''),
-                                'stop': programme.get('stop', ''),
-                                'title': programme.find('title').text if programme.find('title') is not None else '',
-                                'desc': programme.find('desc').text if programme.find('desc') is not None else ''
-                            })
-                            break
+                response.raw.decode_content = True
+                parser = xml_etree.XMLPullParser(events=("start", "end"), **XML_PULL_PARSER_OPTIONS)
+                root = None
+                programme_count = 0
                 
-                logger.info(f"Loaded {len([p for d in fallback_programmes.values() for p in d['programmes']])} programmes from {country}")
+                with gzip.GzipFile(fileobj=response.raw) as f:
+                    for chunk in iter(lambda: f.read(65536), b""):
+                        parser.feed(chunk)
+                        for event, elem in parser.read_events():
+                            if event == "start":
+                                if root is None:
+                                    root = elem
+                                continue
+                            
+                            if elem.tag == 'channel':
+                                channel_id = elem.get('id', '')
+                                display_name = elem.find('display-name')
+                                if display_name is not None and display_name.text:
+                                    # Store by display name (lowercase for matching)
+                                    name_key = display_name.text.lower().strip()
+                                    if name_key not in fallback_programmes:
+                                        entry = {
+                                            'channel_id': channel_id,
+                                            'programmes': []
+                                        }
+                                        fallback_programmes[name_key] = entry
+                                        programmes_by_channel_id.setdefault(channel_id, entry)
+                            elif elem.tag == 'programme':
+                                # Find matching channel by id
+                                data = programmes_by_channel_id.get(elem.get('channel', ''))
+                                if data is not None:
+                                    title = elem.find('title')
+                                    desc = elem.find('desc')
+                                    data['programmes'].append({
+                                        'start': elem.get('start', ''),
+                                        'stop': elem.get('stop', ''),
+                                        'title': title.text if title is not None else '',
+                                        'desc': desc.text if desc is not None else ''
+                                    })
+                                    programme_count += 1
+                            else:
+                                continue
+                            
+                            # Top-level element fully consumed - drop it and everything parsed before it
+                            root.clear()
+                parser.close()
                 
-                # Clean up
-                del xml_content
-                del root
+                logger.info(f"Loaded {programme_count} programmes from {country}")
                 
         except Exception as e:
             logger.error(f"Error fetching EPG fallback for {country}: {e}")
@@ -5601,6 +6173,29 @@ def fetch_epgshare_fallback(countries):
     return fallback_programmes
 
 
+# Fallback EPG for the EPG page endpoints, shared so list -> apply -> apply-all
+# downloads each country file once. refresh_xmltv fetches its own copy.
+_fallback_cache = {"key": None, "data": None, "index": None, "time": 0}
+_fallback_cache_lock = threading.Lock()
+_FALLBACK_CACHE_TTL = 600
+
+
+def get_epgshare_fallback(countries):
+    """Return (fallback data, match index) for countries, fetched at most once per TTL.
+
+    Concurrent callers wait for the in-flight download instead of starting their own.
+    """
+    key = tuple(sorted(c.strip().upper() for c in countries))
+    with _fallback_cache_lock:
+        if _fallback_cache["key"] != key or time.time() - _fallback_cache["time"] >= _FALLBACK_CACHE_TTL:
+            data = fetch_epgshare_fallback(countries)
+            if not data:
+                # Failed downloads are not cached, the next call retries
+                return data, None
+            _fallback_cache.update(key=key, data=data, index=build_epg_match_index(data), time=time.time())
+        return _fallback_cache["data"], _fallback_cache["index"]
+
+
 def refresh_xmltv_with_progress():
     """Wrapper for refresh_xmltv with progress tracking."""
     global epg_refresh_progress
@@ -5610,8 +6205,142 @@ def refresh_xmltv_with_progress():
         epg_refresh_progress["running"] = False
         epg_refresh_progress["current_step"] = "Completed"
 
+def _xmltv_timestamp(ts):
+    """Format a Unix timestamp as an XMLTV UTC time ("YYYYmmddHHMMSS +0000")."""
+    t = time.gmtime(ts)
+    return f"{t.tm_year:04d}{t.tm_mon:02d}{t.tm_mday:02d}{t.tm_hour:02d}{t.tm_min:02d}{t.tm_sec:02d} +0000"
+
+# MACs whose last EPG fetch failed are skipped by later refreshes until their
+# backoff expires: (portal url, mac) -> (consecutive failures, retry timestamp).
+# Keyed per portal because the same MAC is often registered on several portals.
+_epg_mac_backoff = {}
+_epg_mac_backoff_lock = threading.Lock()
+EPG_MAC_BACKOFF_BASE = 300
+EPG_MAC_BACKOFF_MAX = 3600
+
+
+def _epg_mac_failed(url, mac):
+    # Portal workers run in parallel; two portals may share a URL
+    with _epg_mac_backoff_lock:
+        failures = _epg_mac_backoff.get((url, mac), (0, 0))[0] + 1
+        delay = min(EPG_MAC_BACKOFF_BASE * 2 ** (failures - 1), EPG_MAC_BACKOFF_MAX)
+        _epg_mac_backoff[(url, mac)] = (failures, time.time() + delay)
+    logger.info(f"MAC {mac}: skipping EPG refreshes for {delay}s after {failures} failure(s)")
+
+
+def _fetch_portal_epg_data(portal_cfg):
+    """Fetch channels, EPG and genre names for one portal from ALL its MACs.
+
+    Runs in a worker thread of refresh_xmltv, so it only touches the network
+    and the shared progress dict.
+
+    Returns:
+        tuple: (channels map by channelId, merged EPG by channelId, genre names by genre id)
+    """
+    portal_name = portal_cfg["name"]
+    url = portal_cfg["url"]
+    proxy = portal_cfg["proxy"]
+    # Skip MACs still backing off from a failure, unless that leaves none to try
+    now = time.time()
+    macs = [mac for mac in portal_cfg["macs"] if _epg_mac_backoff.get((url, mac), (0, 0))[1] <= now]
+    if len(macs) < len(portal_cfg["macs"]):
+        logger.info(f"Portal {portal_name}: {len(portal_cfg['macs']) - len(macs)} MAC(s) backing off")
+    macs = macs or list(portal_cfg["macs"])
+    
+    logger.info(f"Fetching EPG | Portal: {portal_name} | offset: {portal_cfg['epg offset']} |")
+    epg_refresh_progress["current_step"] = f"{portal_name}: Found {len(macs)} MAC(s), {len(portal_cfg['enabled channels'])} enabled channels"
+
+    # Fetch channels and EPG from ALL MACs and merge
+    all_channels_map = {}  # channelId -> channel data
+    merged_epg = {}  # channelId -> [programmes]
+    
+    mac_index = 0
+    for mac in macs:
+        try:
+            mac_index += 1
+            epg_refresh_progress["current_step"] = f"{portal_name}: Authenticating MAC {mac_index}/{len(macs)} ({mac})"
+            token = stb.getToken(url, mac, proxy)
+            if token:
+                stb.getProfile(url, mac, token, proxy)
+                
+                epg_refresh_progress["current_step"] = f"{portal_name}: Fetching channels from MAC {mac_index}/{len(macs)}"
+                mac_channels = stb.getAllChannels(url, mac, token, proxy)
+                
+                epg_refresh_progress["current_step"] = f"{portal_name}: Fetching EPG from MAC {mac_index}/{len(macs)}"
+                mac_epg = stb.getEpg(url, mac, token, 24, proxy)
+                
+                if mac_channels:
+                    # Earlier MACs win; setdefault does it in one lookup
+                    add_channel = all_channels_map.setdefault
+                    for ch in mac_channels:
+                        add_channel(str(ch.get("id")), ch)
+                    logger.info(f"MAC {mac}: Got {len(mac_channels)} channels")
+                    epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(mac_channels)} channels"
+                
+                if mac_epg:
+                    for ch_id, programmes in mac_epg.items():
+                        # Merge EPG data - add programmes if we don't have any yet
+                        # or if the new data has more programmes
+                        existing = merged_epg.get(ch_id)
+                        if existing is None or len(programmes) > len(existing):
+                            merged_epg[ch_id] = programmes
+                    logger.info(f"MAC {mac}: Got EPG for {len(mac_epg)} channels")
+                    epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - EPG for {len(mac_epg)} channels"
+                else:
+                    logger.warning(f"MAC {mac}: No EPG data returned")
+                    epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - No EPG data"
+                
+                # Clear MAC data
+                if mac_channels:
+                    del mac_channels
+                if mac_epg:
+                    del mac_epg
+                with _epg_mac_backoff_lock:
+                    _epg_mac_backoff.pop((url, mac), None)
+            else:
+                logger.warning(f"MAC {mac}: No token for EPG refresh")
+                _epg_mac_failed(url, mac)
+                
+        except Exception as e:
+            logger.error(f"Error fetching data for MAC {mac}: {e}")
+            epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - Error: {str(e)[:50]}"
+            _epg_mac_failed(url, mac)
+            continue
+    
+    genres_dict = {}
+    if all_channels_map:
+        # Get genres for this portal to show category names
+        try:
+            for mac in macs:
+                token = stb.getToken(url, mac, proxy)
+                if token:
+                    genres = stb.getGenres(url, mac, token, proxy)
+                    if genres:
+                        for genre in genres:
+                            genre_id = str(genre.get("id"))
+                            genre_name = str(genre.get("title", "Unknown"))
+                            genres_dict[genre_id] = genre_name
+                        break  # Got genres, no need to try other MACs
+        except Exception as e:
+            logger.error(f"Error fetching genres: {e}")
+
+    return all_channels_map, merged_epg, genres_dict
+
+
 def refresh_xmltv():
-    """Refresh XMLTV data with memory-optimized processing."""
+    """
+    Refresh XMLTV data with memory-optimized processing.
+    
+    Only one rebuild runs at a time, whoever starts it (background job, EPG
+    page refresh, cold-cache request); later callers wait for the running one.
+    """
+    global last_xmltv_attempt
+    with _xmltv_lock:
+        last_xmltv_attempt = time.time()
+        _build_xmltv()
+
+
+def _build_xmltv():
     import gc
     global epg_refresh_progress
     
@@ -5623,8 +6352,8 @@ def refresh_xmltv():
     os.makedirs(cache_dir, exist_ok=True)
     cache_file = os.path.join(cache_dir, "MacReplayXCEPG.xml")
 
-    day_before_yesterday = datetime.utcnow() - timedelta(days=2)
-    day_before_yesterday_str = day_before_yesterday.strftime("%Y%m%d%H%M%S") + " +0000"
+    # Programmes starting at or before this (UTC, after the portal offset) are dropped
+    epg_cutoff_ts = int(time.time()) - 2 * 86400
 
     # Check if EPG fallback is enabled
     epg_refresh_progress["current_step"] = "Loading EPG settings..."
@@ -5633,94 +6362,99 @@ def refresh_xmltv():
     epg_fallback_countries = [c.strip() for c in epg_fallback_countries if c.strip()]
     
     fallback_epg = {}
+    fallback_epg_index = None
+    fallback_epg_by_id = {}
     if epg_fallback_enabled and epg_fallback_countries:
         epg_refresh_progress["current_step"] = f"Fetching fallback EPG for {', '.join(epg_fallback_countries)}..."
         logger.info(f"EPG fallback enabled for countries: {epg_fallback_countries}")
         fallback_epg = fetch_epgshare_fallback(epg_fallback_countries)
+        fallback_epg_index = build_epg_match_index(fallback_epg)
+        # channel_id -> first entry with that id, for direct lookup of matches
+        for fb_data in fallback_epg.values():
+            fallback_epg_by_id.setdefault(fb_data['channel_id'], fb_data)
         logger.info(f"Loaded fallback EPG for {len(fallback_epg)} channels")
         epg_refresh_progress["current_step"] = f"Loaded fallback EPG for {len(fallback_epg)} channels"
 
-    # Build XMLTV directly without caching old programmes (memory optimization)
-    channels_xml = ET.Element("tv")
-    portals = getPortals()
-    programme_count = 0
-    channels_without_epg = []
-
-    portal_index = 0
-    for portal in portals:
-        if portals[portal]["enabled"] == "true":
-            portal_index += 1
-            portal_name = portals[portal]["name"]
-            portal_epg_offset = int(portals[portal]["epg offset"])
-            
-            # Update progress - show current portal being processed
-            epg_refresh_progress["current_portal"] = portal_name
-            epg_refresh_progress["current_step"] = f"Starting {portal_name}..."
-            epg_refresh_progress["portals_done"] = portal_index - 1  # Show as "processing X of Y"
-            
-            logger.info(f"Fetching EPG | Portal: {portal_name} | offset: {portal_epg_offset} |")
+    # Build XMLTV incrementally: every finished <channel>/<programme> is serialized
+    # straight into a temp cache file and dropped, so neither a document tree nor
+    # a second in-memory copy of the output is ever held. Each run gets its own
+    # temp file; if writing fails it is removed and the previous guide stays.
+    tmp_cache_file = None
+    try:
+        fd, tmp_cache_file = tempfile.mkstemp(prefix="MacReplayXCEPG.", suffix=".tmp", dir=cache_dir)
+        xmltv_out = os.fdopen(fd, "wb", buffering=1 << 20)
+    except OSError as e:
+        logger.error(f"Error opening XMLTV cache for writing, building in memory: {e}")
+        if tmp_cache_file is not None:
+            os.close(fd)
+            os.remove(tmp_cache_file)
+            tmp_cache_file = None
+        xmltv_out = io.BytesIO()
+
+    def emit(element):
+        # Write errors propagate (see the OSError handlers below) and abort the run
+        xmltv_out.write(xml_etree.tostring(element, encoding="utf-8"))
 
-            enabledChannels = portals[portal].get("enabled channels", [])
-            if len(enabledChannels) != 0:
-                name = portals[portal]["name"]
-                url = portals[portal]["url"]
-                macs = list(portals[portal]["macs"].keys())
-                proxy = portals[portal]["proxy"]
-                customChannelNames = portals[portal].get("custom channel names", {})
-                customEpgIds = portals[portal].get("custom epg ids", {})
-                customChannelNumbers = portals[portal].get("custom channel numbers", {})
+    try:
+        xmltv_out.write(b"<?xml version='1.0' encoding='utf-8'?>\n<tv>")
 
-                epg_refresh_progress["current_step"] = f"{portal_name}: Found {len(macs)} MAC(s), {len(enabledChannels)} enabled channels"
+        portals = getPortals()
+        programme_count = 0
+        channels_without_epg = []
+
+        enabled_portals = [
+            (portal, portals[portal]) for portal in portals
+            if portals[portal]["enabled"] == "true"
+        ]
+
+        portal_index = 0
+        # Portal fetches are network-bound, so run them side by side; the XMLTV is
+        # still assembled on this thread, one portal at a time in config order.
+        # Only a window of portals is fetched ahead, so finished portals waiting for
+        # their turn cannot pile up in memory.
+        fetch_window = max(1, min(PORTAL_REFRESH_WORKERS, len(enabled_portals)))
+        with ThreadPoolExecutor(max_workers=fetch_window) as executor:
+            futures = {}  # index into enabled_portals -> future, None for portals without enabled channels
+
+            def submit_fetch(index):
+                if index < len(enabled_portals):
+                    portal_cfg = enabled_portals[index][1]
+                    futures[index] = (
+                        executor.submit(_fetch_portal_epg_data, portal_cfg)
+                        if portal_cfg.get("enabled channels") else None
+                    )
 
-                # Fetch channels and EPG from ALL MACs and merge
-                all_channels_map = {}  # channelId -> channel data
-                merged_epg = {}  # channelId -> [programmes]
+            for index in range(fetch_window):
+                submit_fetch(index)
+            for index, (portal, portal_cfg) in enumerate(enabled_portals):
+                portal_index += 1
+                portal_name = portal_cfg["name"]
+                portal_epg_offset = int(portal_cfg["epg offset"])
+                epg_offset_seconds = portal_epg_offset * 3600
+                portal_cutoff_ts = epg_cutoff_ts - epg_offset_seconds
                 
-                mac_index = 0
-                for mac in macs:
-                    try:
-                        mac_index += 1
-                        epg_refresh_progress["current_step"] = f"{portal_name}: Authenticating MAC {mac_index}/{len(macs)} ({mac})"
-                        token = stb.getToken(url, mac, proxy)
-                        if token:
-                            stb.getProfile(url, mac, token, proxy)
-                            
-                            epg_refresh_progress["current_step"] = f"{portal_name}: Fetching channels from MAC {mac_index}/{len(macs)}"
-                            mac_channels = stb.getAllChannels(url, mac, token, proxy)
-                            
-                            epg_refresh_progress["current_step"] = f"{portal_name}: Fetching EPG from MAC {mac_index}/{len(macs)}"
-                            mac_epg = stb.getEpg(url, mac, token, 24, proxy)
-                            
-                            if mac_channels:
-                                for ch in mac_channels:
-                                    ch_id = str(ch.get("id"))
-                                    if ch_id not in all_channels_map:
-                                        all_channels_map[ch_id] = ch
-                                logger.info(f"MAC {mac}: Got {len(mac_channels)} channels")
-                                epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - {len(mac_channels)} channels"
-                            
-                            if mac_epg:
-                                for ch_id, programmes in mac_epg.items():
-                                    # Merge EPG data - add programmes if we don't have any yet
-                                    # or if the new data has more programmes
-                                    if ch_id not in merged_epg or len(programmes) > len(merged_epg.get(ch_id, [])):
-                                        merged_epg[ch_id] = programmes
-                                logger.info(f"MAC {mac}: Got EPG for {len(mac_epg)} channels")
-                                epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - EPG for {len(mac_epg)} channels"
-                            else:
-                                logger.warning(f"MAC {mac}: No EPG data returned")
-                                epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - No EPG data"
-                            
-                            # Clear MAC data
-                            if mac_channels:
-                                del mac_channels
-                            if mac_epg:
-                                del mac_epg
-                            
-                    except Exception as e:
-                        logger.error(f"Error fetching data for MAC {mac}: {e}")
-                        epg_refresh_progress["current_step"] = f"{portal_name}: MAC {mac_index}/{len(macs)} - Error: {str(e)[:50]}"
-                        continue
+                # Update progress - show current portal being processed
+                epg_refresh_progress["current_portal"] = portal_name
+                epg_refresh_progress["portals_done"] = portal_index - 1  # Show as "processing X of Y"
+                
+                # Let the portal's data go once it has been written, and start the next fetch
+                future = futures.pop(index)
+                submit_fetch(index + fetch_window)
+                if future is None:
+                    continue
+                
+                name = portal_cfg["name"]
+                enabledChannels = portal_cfg["enabled channels"]
+                customChannelNames = portal_cfg.get("custom channel names", {})
+                customEpgIds = portal_cfg.get("custom epg ids", {})
+                customChannelNumbers = portal_cfg.get("custom channel numbers", {})
+                
+                try:
+                    all_channels_map, merged_epg, genres_dict = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching EPG for {portal_name}: {e}")
+                    all_channels_map, merged_epg, genres_dict = {}, {}, {}
+                del future
                 
                 logger.info(f"Portal {portal_name}: Total {len(all_channels_map)} channels, EPG for {len(merged_epg)} channels")
                 epg_refresh_progress["current_step"] = f"{portal_name}: Processing {len(all_channels_map)} channels..."
@@ -5741,37 +6475,27 @@ def refresh_xmltv():
                     db_custom_epg_ids = {row['channel_id']: row['custom_epg_id'] for row in cursor.fetchall()}
                     conn.close()
                     
-                    # Get genres for this portal to show category names
-                    genres_dict = {}
-                    try:
-                        for mac in macs:
-                            token = stb.getToken(url, mac, proxy)
-                            if token:
-                                genres = stb.getGenres(url, mac, token, proxy)
-                                if genres:
-                                    for genre in genres:
-                                        genre_id = str(genre.get("id"))
-                                        genre_name = str(genre.get("title", "Unknown"))
-                                        genres_dict[genre_id] = genre_name
-                                    break  # Got genres, no need to try other MACs
-                    except Exception as e:
-                        logger.error(f"Error fetching genres: {e}")
-                    
                     epg_refresh_progress["current_step"] = f"{portal_name}: Building XMLTV for {len(enabled_set)} enabled channels..."
                     
-                    # Group channels by genre for progress display
-                    channels_by_genre = {}
-                    for channelId, channel in all_channels_map.items():
-                        if channelId in enabled_set:
-                            genre_id = str(channel.get("tv_genre_id", ""))
-                            genre_name = genres_dict.get(genre_id, "Other")
-                            if genre_name not in channels_by_genre:
-                                channels_by_genre[genre_name] = []
-                            channels_by_genre[genre_name].append((channelId, channel))
+                    # Group channels by genre for progress display. Only the enabled
+                    # channels are visited (usually a small part of the portal); walking
+                    # the enabled list instead of a set keeps the guide order stable.
+                    channels_by_genre = defaultdict(list)
+                    for channelId in dict.fromkeys(enabledChannels):
+                        channel = all_channels_map.get(channelId)
+                        if channel is None:
+                            continue
+                        genre_id = str(channel.get("tv_genre_id", ""))
+                        genre_name = genres_dict.get(genre_id, "Other")
+                        channels_by_genre[genre_name].append((channelId, channel))
                     
                     # Process channels by genre
                     processed_channels = 0
                     total_enabled = len(enabled_set)
+                    custom_name_get = customChannelNames.get
+                    custom_number_get = customChannelNumbers.get
+                    custom_epg_get = customEpgIds.get
+                    db_custom_epg_get = db_custom_epg_ids.get
                     
                     for genre_name, genre_channels in channels_by_genre.items():
                         epg_refresh_progress["current_step"] = f"{portal_name}: Processing {genre_name} ({processed_channels}/{total_enabled} channels)"
@@ -5784,16 +6508,17 @@ def refresh_xmltv():
                                 if processed_channels % 10 == 0:
                                     epg_refresh_progress["current_step"] = f"{portal_name}: Processing {genre_name} ({processed_channels}/{total_enabled} channels)"
                                 
-                                channelName = customChannelNames.get(channelId, channel.get("name"))
-                                channelNumber = customChannelNumbers.get(channelId, str(channel.get("number")))
+                                channelName = custom_name_get(channelId, channel.get("name"))
+                                channelNumber = custom_number_get(channelId, str(channel.get("number")))
                                 # Priority: 1. Database custom EPG ID, 2. JSON config custom EPG ID, 3. Channel number
-                                epgId = db_custom_epg_ids.get(channelId) or customEpgIds.get(channelId, channelNumber)
+                                epgId = db_custom_epg_get(channelId) or custom_epg_get(channelId, channelNumber)
 
-                                channelEle = ET.SubElement(channels_xml, "channel", id=epgId)
-                                ET.SubElement(channelEle, "display-name").text = channelName
+                                channelEle = xml_etree.Element("channel", id=epgId)
+                                xml_etree.SubElement(channelEle, "display-name").text = channelName
                                 logo = channel.get("logo")
                                 if logo:
-                                    ET.SubElement(channelEle, "icon", src=logo)
+                                    xml_etree.SubElement(channelEle, "icon", src=logo)
+                                emit(channelEle)
 
                                 channel_epg = merged_epg.get(channelId, [])
                                 
@@ -5802,27 +6527,24 @@ def refresh_xmltv():
                                     fallback_used = False
                                     if epg_fallback_enabled and fallback_epg:
                                         # Try to match by channel name using improved matching
-                                        matched_fb_id = find_best_epg_match(channelName, fallback_epg)
+                                        matched_fb_id = find_best_epg_match(channelName, fallback_epg, fallback_epg_index)
                                         if matched_fb_id:
-                                            # Find the fallback data by channel_id
-                                            fb_data = None
-                                            for fb_name, data in fallback_epg.items():
-                                                if data['channel_id'] == matched_fb_id:
-                                                    fb_data = data
-                                                    break
-                                            
+                                            fb_data = fallback_epg_by_id.get(matched_fb_id)
                                             if fb_data and fb_data.get('programmes'):
                                                 for p in fb_data['programmes'][:50]:  # Limit to 50 programmes
                                                     try:
-                                                        programmeEle = ET.SubElement(
-                                                            channels_xml, "programme",
+                                                        programmeEle = xml_etree.Element(
+                                                            "programme",
                                                             start=p['start'], stop=p['stop'], channel=epgId
                                                         )
-                                                        ET.SubElement(programmeEle, "title").text = p['title']
+                                                        xml_etree.SubElement(programmeEle, "title").text = p['title']
                                                         if p['desc']:
-                                                            ET.SubElement(programmeEle, "desc").text = p['desc']
+                                                            xml_etree.SubElement(programmeEle, "desc").text = p['desc']
+                                                        emit(programmeEle)
                                                         programme_count += 1
                                                         fallback_used = True
+                                                    except OSError:
+                                                        raise
                                                     except Exception as e:
                                                         pass
                                                 if fallback_used:
@@ -5835,38 +6557,41 @@ def refresh_xmltv():
                                         stop_time = start_time + timedelta(hours=24)
                                         start = start_time.strftime("%Y%m%d%H%M%S") + " +0000"
                                         stop = stop_time.strftime("%Y%m%d%H%M%S") + " +0000"
-                                        programmeEle = ET.SubElement(
-                                            channels_xml, "programme", start=start, stop=stop, channel=epgId
+                                        programmeEle = xml_etree.Element(
+                                            "programme", start=start, stop=stop, channel=epgId
                                         )
-                                        ET.SubElement(programmeEle, "title").text = channelName
-                                        ET.SubElement(programmeEle, "desc").text = channelName
+                                        xml_etree.SubElement(programmeEle, "title").text = channelName
+                                        xml_etree.SubElement(programmeEle, "desc").text = channelName
+                                        emit(programmeEle)
                                         programme_count += 1
                                 else:
                                     for p in channel_epg:
                                         try:
                                             start_ts = p.get("start_timestamp")
+                                            if not start_ts or start_ts <= portal_cutoff_ts:
+                                                continue
                                             stop_ts = p.get("stop_timestamp")
-                                            if not start_ts or not stop_ts:
+                                            if not stop_ts:
                                                 continue
                                                 
-                                            start_time = datetime.utcfromtimestamp(start_ts) + timedelta(hours=portal_epg_offset)
-                                            stop_time = datetime.utcfromtimestamp(stop_ts) + timedelta(hours=portal_epg_offset)
-                                            start = start_time.strftime("%Y%m%d%H%M%S") + " +0000"
-                                            stop = stop_time.strftime("%Y%m%d%H%M%S") + " +0000"
-                                            
-                                            if start <= day_before_yesterday_str:
-                                                continue
+                                            start = _xmltv_timestamp(start_ts + epg_offset_seconds)
+                                            stop = _xmltv_timestamp(stop_ts + epg_offset_seconds)
                                                 
-                                            programmeEle = ET.SubElement(
-                                                channels_xml, "programme", start=start, stop=stop, channel=epgId
+                                            programmeEle = xml_etree.Element(
+                                                "programme", start=start, stop=stop, channel=epgId
                                             )
-                                            ET.SubElement(programmeEle, "title").text = p.get("name", "")
+                                            xml_etree.SubElement(programmeEle, "title").text = p.get("name", "")
                                             desc = p.get("descr", "")
                                             if desc:
-                                                ET.SubElement(programmeEle, "desc").text = desc
+                                                xml_etree.SubElement(programmeEle, "desc").text = desc
+                                            emit(programmeEle)
                                             programme_count += 1
+                                        except OSError:
+                                            raise
                                         except Exception as e:
                                             logger.error(f"Error processing programme: {e}")
+                            except OSError:
+                                raise
                             except Exception as e:
                                 logger.error(f"Error processing channel: {e}")
                     
@@ -5881,36 +6606,43 @@ def refresh_xmltv():
                     epg_refresh_progress["current_step"] = f"{portal_name}: Error - skipping"
                     epg_refresh_progress["portals_done"] = portal_index  # Mark this portal as done
 
-    if channels_without_epg:
-        logger.warning(f"{len(channels_without_epg)} channels without EPG data")
-
-    epg_refresh_progress["current_step"] = "Generating XMLTV file..."
-    # Generate XML string without minidom (much more memory efficient)
-    rough_string = ET.tostring(channels_xml, encoding="unicode")
-    
-    # Simple formatting without minidom
-    formatted_xmltv = '<?xml version="1.0" encoding="UTF-8"?>\n' + rough_string
+        if channels_without_epg:
+            logger.warning(f"{len(channels_without_epg)} channels without EPG data")
 
-    epg_refresh_progress["current_step"] = f"Writing XMLTV cache ({programme_count} programmes)..."
-    # Write to cache file
-    try:
-        with open(cache_file, "w", encoding="utf-8") as f:
-            f.write(formatted_xmltv)
-        logger.info(f"XMLTV cache updated with {programme_count} programmes.")
-        epg_refresh_progress["current_step"] = f"XMLTV cache updated with {programme_count} programmes"
-    except Exception as e:
-        logger.error(f"Error writing XMLTV cache: {e}")
-        epg_refresh_progress["current_step"] = f"Error writing cache: {str(e)}"
+        epg_refresh_progress["current_step"] = f"Writing XMLTV cache ({programme_count} programmes)..."
+        xmltv_out.write(b"</tv>")
+        if tmp_cache_file is None:
+            formatted_xmltv = xmltv_out.getvalue()
+            epg_refresh_progress["current_step"] = "Error writing cache: built in memory only"
+        else:
+            xmltv_out.close()
+            os.chmod(tmp_cache_file, 0o644)
+            # Serve responses from a single copy of the bytes, then swap the finished file in whole
+            with open(tmp_cache_file, "rb") as f:
+                formatted_xmltv = f.read()
+            os.replace(tmp_cache_file, cache_file)
+            tmp_cache_file = None
+            logger.info(f"XMLTV cache updated with {programme_count} programmes.")
+            epg_refresh_progress["current_step"] = f"XMLTV cache updated with {programme_count} programmes"
+    except OSError as e:
+        logger.error(f"Error writing XMLTV cache, keeping the previous guide: {e}")
+        epg_refresh_progress["current_step"] = f"Error writing XMLTV cache: {str(e)[:50]}"
+        return
+    finally:
+        xmltv_out.close()
+        if tmp_cache_file is not None:
+            try:
+                os.remove(tmp_cache_file)
+            except OSError:
+                pass
 
     epg_refresh_progress["current_step"] = "Finalizing..."
     # Update global cache
     global cached_xmltv, last_updated
-    cached_xmltv = formatted_xmltv
+    cached_xmltv = (formatted_xmltv, content_etag(formatted_xmltv))
     last_updated = time.time()
     
     # Clean up
-    del channels_xml
-    del rough_string
     del fallback_epg
     gc.collect()
     
@@ -5939,7 +6671,7 @@ def xmltv():
             system_username = settings.get("username", "admin")
             system_password = settings.get("password", "12345")
             
-            if auth.username == system_username and auth.password == system_password:
+            if credentials_match(auth.username, auth.password, system_username, system_password):
                 # Basic Auth successful
                 logger.info(f"Basic Auth successful for XMLTV: {auth.username}")
                 return _xmltv()
@@ -5961,16 +6693,30 @@ def xmltv():
             return authorise(lambda: _xmltv())()
 
 def _xmltv():
-    global cached_xmltv, last_updated
     logger.info("Guide Requested")
-    
-    if cached_xmltv is None or (time.time() - last_updated) > 900:
-        refresh_xmltv()
-    
-    return Response(
-        cached_xmltv,
-        mimetype="text/xml",
-    )
+    return _cached_xmltv_response()
+
+
+def _cached_xmltv_response():
+    """Serve the cached guide, building it first if there is none yet."""
+    cached = cached_xmltv
+    if cached is None:
+        # Double-checked: waits for a rebuild already running (from any caller)
+        # and only starts one if the guide is still missing afterwards
+        with _xmltv_lock:
+            if cached_xmltv is None:
+                refresh_xmltv()
+            cached = cached_xmltv
+    elif (time.time() - max(last_updated, last_xmltv_attempt)) > XMLTV_MAX_AGE:
+        # Serve the stale guide now and rebuild it in the background; a failed
+        # rebuild is only retried after another XMLTV_MAX_AGE
+        schedule_refresh(refresh_xmltv, rerun=False)
+    
+    if cached is None:
+        # The rebuild failed (e.g. the cache could not be written) or was invalidated again
+        return Response("Guide not available, try again later", status=503, mimetype="text/plain")
+    body, etag = cached
+    return cached_body_response(body, etag, "text/xml")
 
 # ============================================
 # EPG Routes - with caching to prevent memory leaks
@@ -5981,24 +6727,29 @@ _epg_cache = {
     "portal_status": None,
     "portal_status_time": 0,
     "channels": None,
+    "channels_etag": None,
     "channels_time": 0,
     "programs": None,
     "programs_time": 0
 }
 _EPG_CACHE_TTL = 300  # 5 minutes cache
+# Held while an entry is rebuilt, so concurrent misses rebuild it once and a
+# clear issued mid-rebuild cannot be overwritten by the pre-clear result
+_epg_cache_lock = threading.Lock()
 
 
 def _clear_epg_cache():
     """Clear EPG cache."""
-    global _epg_cache
-    _epg_cache = {
-        "portal_status": None,
-        "portal_status_time": 0,
-        "channels": None,
-        "channels_time": 0,
-        "programs": None,
-        "programs_time": 0
-    }
+    with _epg_cache_lock:
+        _epg_cache.update({
+            "portal_status": None,
+            "portal_status_time": 0,
+            "channels": None,
+            "channels_etag": None,
+            "channels_time": 0,
+            "programs": None,
+            "programs_time": 0
+        })
 
 
 @app.route("/epg", methods=["GET"])
@@ -6025,6 +6776,12 @@ def epg_portal_status():
         portals = getPortals()
         valid_portal_ids = set(portals.keys())
         
+        # Status polls are answered with 304 until the channels DB or the portal list changes
+        etag = db_etag(*sorted(valid_portal_ids))
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        
         # Get portal info from database only - no API queries
         conn = get_db_connection()
         cursor = conn.cursor()
@@ -6061,13 +6818,16 @@ def epg_portal_status():
         
         # Cache the result
         _epg_cache["portal_status"] = portal_status
-        _epg_cache["portal_status_time"] = time.time()
+        _epg_cache["portal_status_time"] = time.monotonic()
         
         logger.info(f"Returned EPG status for {len(portal_status)} portals from database")
-        return flask.jsonify(portal_status)
+        response = json_response(portal_status)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
     except Exception as e:
         logger.error(f"Error getting portal EPG status: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/epg/settings", methods=["GET"])
@@ -6087,7 +6847,7 @@ def epg_settings_save():
     """Save EPG fallback settings."""
     try:
         data = request.json
-        settings = getSettings()
+        settings = dict(getSettings())
         
         settings["epg fallback enabled"] = "true" if data.get("epg_fallback_enabled") else "false"
         settings["epg fallback countries"] = data.get("epg_fallback_countries", "")
@@ -6105,66 +6865,75 @@ def epg_settings_save():
 @authorise
 def epg_channels():
     """Get all enabled channels with their EPG mapping status from database - NO portal queries."""
-    global _epg_cache
-    
-    # Return cached data if still valid
-    if _epg_cache["channels"] and (time.time() - _epg_cache["channels_time"]) < _EPG_CACHE_TTL:
-        return flask.jsonify({"channels": _epg_cache["channels"]})
+    # Return cached data if still valid; the cache holds the serialized response body
+    body, etag = _epg_cache["channels"], _epg_cache["channels_etag"]
+    if body and (time.monotonic() - _epg_cache["channels_time"]) < _EPG_CACHE_TTL:
+        return cached_body_response(body, etag, "application/json")
     
     try:
-        # Get channels from database ONLY - no portal queries
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                portal, channel_id, portal_name, name, number, logo, genre,
-                custom_name, custom_genre, custom_epg_id, has_portal_epg
-            FROM channels
-            WHERE enabled = 1
-            ORDER BY portal_name, CAST(COALESCE(NULLIF(custom_number, ''), number) AS INTEGER)
-        ''')
-        
-        channels = []
-        
-        for row in cursor.fetchall():
-            channel_name = row['custom_name'] if row['custom_name'] else row['name']
-            channel_genre = row['custom_genre'] if row['custom_genre'] else row['genre']
-            epg_id = row['custom_epg_id'] if row['custom_epg_id'] else ''
+        with _epg_cache_lock:
+            # Another request may have rebuilt the cache while this one waited
+            body, etag = _epg_cache["channels"], _epg_cache["channels_etag"]
+            if body and (time.monotonic() - _epg_cache["channels_time"]) < _EPG_CACHE_TTL:
+                return cached_body_response(body, etag, "application/json")
             
-            # Try to get has_portal_epg, default to 0 if column doesn't exist yet
-            try:
-                has_portal_epg = bool(row['has_portal_epg'])
-            except (KeyError, IndexError):
-                has_portal_epg = False
+            # Get channels from database ONLY - no portal queries
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT 
+                    portal, channel_id, portal_name, name, number, logo, genre,
+                    custom_name, custom_genre, custom_epg_id, has_portal_epg
+                FROM channels
+                WHERE enabled = 1
+                ORDER BY portal_name, CAST(COALESCE(NULLIF(custom_number, ''), number) AS INTEGER)
+            ''')
             
-            # has_epg = True if custom_epg_id is set OR has portal EPG
-            has_epg = bool(epg_id) or has_portal_epg
+            channels = []
             
-            channels.append({
-                "portal_id": row['portal'],
-                "portal_name": row['portal_name'] or '',
-                "channel_id": row['channel_id'],
-                "channel_name": channel_name,
-                "channel_number": row['number'] or '',
-                "channel_genre": channel_genre or '',
-                "epg_id": epg_id,
-                "has_epg": has_epg,
-                "has_portal_epg": has_portal_epg,  # Now from database!
-                "logo": row['logo'] or ''
-            })
-        
-        conn.close()
-        
-        # Cache the result
-        _epg_cache["channels"] = channels
-        _epg_cache["channels_time"] = time.time()
-        
-        logger.info(f"Returned {len(channels)} channels for EPG page from database")
-        return flask.jsonify({"channels": channels})
+            for row in cursor.fetchall():
+                channel_name = row['custom_name'] if row['custom_name'] else row['name']
+                channel_genre = row['custom_genre'] if row['custom_genre'] else row['genre']
+                epg_id = row['custom_epg_id'] if row['custom_epg_id'] else ''
+            
+                # Try to get has_portal_epg, default to 0 if column doesn't exist yet
+                try:
+                    has_portal_epg = bool(row['has_portal_epg'])
+                except (KeyError, IndexError):
+                    has_portal_epg = False
+            
+                # has_epg = True if custom_epg_id is set OR has portal EPG
+                has_epg = bool(epg_id) or has_portal_epg
+            
+                channels.append({
+                    "portal_id": row['portal'],
+                    "portal_name": row['portal_name'] or '',
+                    "channel_id": row['channel_id'],
+                    "channel_name": channel_name,
+                    "channel_number": row['number'] or '',
+                    "channel_genre": channel_genre or '',
+                    "epg_id": epg_id,
+                    "has_epg": has_epg,
+                    "has_portal_epg": has_portal_epg,  # Now from database!
+                    "logo": row['logo'] or ''
+                })
+            
+            conn.close()
+            
+            # Cache the serialized result: polls within the TTL skip both the
+            # query and the encoding, and only the bytes are kept alive
+            body = json_dumps({"channels": channels})
+            etag = content_etag(body)
+            _epg_cache["channels"] = body
+            _epg_cache["channels_etag"] = etag
+            _epg_cache["channels_time"] = time.monotonic()
+            
+            logger.info(f"Returned {len(channels)} channels for EPG page from database")
+            return cached_body_response(body, etag, "application/json")
     except Exception as e:
         logger.error(f"Error getting EPG channels: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/epg/fallback-channels", methods=["GET"])
@@ -6176,15 +6945,15 @@ def epg_fallback_channels():
     countries = [c.strip() for c in countries if c.strip()]
     
     if not countries:
-        return flask.jsonify({"channels": [], "message": "No fallback countries configured"})
+        return json_response({"channels": [], "message": "No fallback countries configured"})
     
     try:
-        fallback_data = fetch_epgshare_fallback(countries)
+        fallback_data, _ = get_epgshare_fallback(countries)
         channels = list(fallback_data.keys())
-        return flask.jsonify({"channels": sorted(channels), "count": len(channels)})
+        return json_response({"channels": sorted(channels), "count": len(channels)})
     except Exception as e:
         logger.error(f"Error fetching fallback channels: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/epg/apply-fallback", methods=["POST"])
@@ -6209,11 +6978,11 @@ def epg_apply_fallback():
         if not countries:
             return flask.jsonify({"error": "No fallback countries configured"}), 400
         
-        fallback_data = fetch_epgshare_fallback(countries)
+        fallback_data, fallback_index = get_epgshare_fallback(countries)
         
         # Use improved matching function
         search_name = fallback_name or channel_name
-        matched_epg_id = find_best_epg_match(search_name, fallback_data)
+        matched_epg_id = find_best_epg_match(search_name, fallback_data, fallback_index)
         
         if not matched_epg_id:
             logger.warning(f"No fallback match found for '{search_name}'")
@@ -6256,7 +7025,7 @@ def epg_apply_fallback_all():
         channels = data.get("channels", [])
         
         if not channels:
-            return flask.jsonify({"error": "No channels provided"}), 400
+            return json_response({"error": "No channels provided"}), 400
         
         # Filter to only channels without portal EPG (has_portal_epg = False)
         # This should significantly reduce the number of channels to process
@@ -6268,7 +7037,7 @@ def epg_apply_fallback_all():
         channels = channels_without_portal_epg
         
         if not channels:
-            return flask.jsonify({
+            return json_response({
                 "success": True,
                 "matched": 0,
                 "total": 0,
@@ -6277,7 +7046,7 @@ def epg_apply_fallback_all():
         
         # Increased limit since we're now only processing channels without portal EPG
         if len(channels) > 5000:
-            return flask.jsonify({
+            return json_response({
                 "error": f"Too many channels without portal EPG ({len(channels)}). Please apply fallback manually to specific channels."
             }), 400
         
@@ -6287,13 +7056,13 @@ def epg_apply_fallback_all():
         countries = [c.strip() for c in countries if c.strip()]
         
         if not countries:
-            return flask.jsonify({"error": "No fallback countries configured. Configure in EPG Fallback tab."}), 400
+            return json_response({"error": "No fallback countries configured. Configure in EPG Fallback tab."}), 400
         
         logger.info(f"Fetching fallback EPG for countries: {countries}")
-        fallback_data = fetch_epgshare_fallback(countries)
+        fallback_data, fallback_index = get_epgshare_fallback(countries)
         
         if not fallback_data:
-            return flask.jsonify({"error": "Failed to fetch fallback data"}), 500
+            return json_response({"error": "Failed to fetch fallback data"}), 500
         
         # Update database directly for better performance
         conn = get_db_connection()
@@ -6311,7 +7080,7 @@ def epg_apply_fallback_all():
                 continue
             
             # Try to find matching channel using improved matching
-            matched_epg_id = find_best_epg_match(channel_name, fallback_data)
+            matched_epg_id = find_best_epg_match(channel_name, fallback_data, fallback_index)
             
             if matched_epg_id:
                 # Update database
@@ -6328,13 +7097,14 @@ def epg_apply_fallback_all():
         conn.commit()
         conn.close()
         
-        # Clear caches
-        global cached_xmltv
-        cached_xmltv = None
+        # Rebuild the guide in the background; /xmltv keeps serving the old one
+        # until it is ready instead of the next client waiting for the rebuild
+        if matched_count:
+            schedule_refresh(refresh_xmltv)
         _clear_epg_cache()
         
         logger.info(f"Applied fallback to {matched_count}/{total_count} channels")
-        return flask.jsonify({
+        return json_response({
             "success": True,
             "matched": matched_count,
             "total": total_count,
@@ -6342,7 +7112,7 @@ def epg_apply_fallback_all():
         })
     except Exception as e:
         logger.error(f"Error applying fallback to all: {e}")
-        return flask.jsonify({"error": str(e)}), 500
+        return json_response({"error": str(e)}), 500
 
 
 @app.route("/epg/save-mapping", methods=["POST"])
@@ -6613,7 +7383,7 @@ def xc_api():
 
 def xc_get_user_info(user_id, user):
     """Get XC user info."""
-    active_cons = len(user.get("active_connections", {}))
+    active_cons = countXCConnections(user_id)
     max_cons = int(user.get("max_connections", 1))
     
     expires_at = user.get("expires_at", "")
@@ -6791,7 +7561,6 @@ def xc_get_live_streams(user):
             
             # XC API expects numeric stream_id - use deterministic hash
             # Python's hash() is not deterministic across sessions, so use hashlib
-            import hashlib
             numeric_id = int(hashlib.md5(internal_id.encode()).hexdigest()[:8], 16)
             
             # Create category_id that matches the one in xc_get_live_categories
@@ -6935,8 +7704,6 @@ def xc_get_vod_streams(user):
         db_items = cursor.fetchall()
         conn.close()
         
-        import hashlib
-        
         for item in db_items:
             portal_id = item['portal_id']
             
@@ -6977,7 +7744,6 @@ def xc_get_vod_info(user, vod_id):
     - A numeric hash (from get_vod_streams response)
     - A custom_sid string (portalId_vod_itemId)
     """
-    import hashlib
     
     portals = getPortals()
     allowed_portals = user.get("allowed_portals", [])
@@ -7131,8 +7897,6 @@ def xc_get_series(user):
         db_items = cursor.fetchall()
         conn.close()
         
-        import hashlib
-        
         for item in db_items:
             portal_id = item['portal_id']
             
@@ -7173,7 +7937,6 @@ def generate_episode_id(portal_id, series_id, season_num, episode_num):
     Format: MD5 hash of "portalId_series_seriesId_sSeasonNum_eEpisodeNum"
     Returns: Numeric ID as string
     """
-    import hashlib
     internal_id = f"{portal_id}_series_{series_id}_s{season_num}_e{episode_num}"
     return str(int(hashlib.md5(internal_id.encode()).hexdigest()[:8], 16))
 
@@ -7254,7 +8017,6 @@ def xc_get_series_info(user, series_id):
     - A numeric hash (from get_series response)
     - A custom_sid string (portalId_series_itemId)
     """
-    import hashlib
     
     portals = getPortals()
     allowed_portals = user.get("allowed_portals", [])
@@ -7562,7 +8324,6 @@ def xc_stream(username, password, stream_id, extension=None):
         portals = getPortals()
         found = False
         
-        import hashlib
         # Create a copy to avoid RuntimeError if dictionary changes during iteration
         for pid, portal in list(portals.items()):
             if portal.get("enabled") != "true":
@@ -7625,8 +8386,6 @@ def test_vod_stream_quick(stream_url, proxy=None):
     Returns True if stream is accessible, False otherwise.
     Uses Range header to only fetch first few bytes.
     """
-    import requests
-    
     try:
         proxies = {"http": proxy, "https": proxy} if proxy else None
         headers = {
@@ -7634,7 +8393,7 @@ def test_vod_stream_quick(stream_url, proxy=None):
             "Range": "bytes=0-1023"  # Only request first 1KB
         }
         
-        response = requests.get(
+        response = http_session.get(
             stream_url, 
             headers=headers, 
             proxies=proxies, 
@@ -7673,7 +8432,7 @@ def ffmpeg_vod_stream(stream_url, proxy=None):
     
     # Build FFmpeg command
     ffmpeg_cmd = [
-        "ffmpeg",
+        ffmpeg_path,
         "-hide_banner",
         "-loglevel", "error",
         "-reconnect", "1",
@@ -7703,6 +8462,7 @@ def ffmpeg_vod_stream(stream_url, proxy=None):
                 stderr=subprocess.PIPE,
                 bufsize=65536
             )
+            enlarge_pipe(process.stdout.fileno())
             
             while True:
                 chunk = process.stdout.read(65536)
@@ -7739,8 +8499,6 @@ def proxy_vod_stream(stream_url, proxy=None):
     
     This is needed for IPTV apps that don't follow HTTP redirects properly.
     """
-    import requests
-    
     # Check if this is a HEAD request (iOS apps often do HEAD first)
     is_head_request = request.method == 'HEAD'
     
@@ -7768,7 +8526,7 @@ def proxy_vod_stream(stream_url, proxy=None):
     # For HEAD requests, try to get content info
     if is_head_request:
         try:
-            head_resp = requests.head(stream_url, headers=req_headers, proxies=proxies, 
+            head_resp = http_session.head(stream_url, headers=req_headers, proxies=proxies, 
                                       timeout=10, allow_redirects=True)
             if head_resp.headers.get('Content-Length'):
                 resp_headers["Content-Length"] = head_resp.headers.get('Content-Length')
@@ -7783,7 +8541,7 @@ def proxy_vod_stream(stream_url, proxy=None):
     # For GET requests, stream the content
     def generate():
         try:
-            with requests.get(stream_url, headers=req_headers, proxies=proxies, 
+            with http_session.get(stream_url, headers=req_headers, proxies=proxies, 
                             stream=True, timeout=60) as r:
                 r.raise_for_status()
                 for chunk in r.iter_content(chunk_size=65536):
@@ -7806,7 +8564,6 @@ def proxy_vod_stream(stream_url, proxy=None):
 @xc_auth_only
 def xc_movie_stream(username, password, stream_id, extension=None):
     """XC API movie/VOD stream endpoint."""
-    import hashlib
     
     settings = getSettings()
     if settings.get("xc api enabled") != "true":
@@ -7816,6 +8573,8 @@ def xc_movie_stream(username, password, stream_id, extension=None):
     if not user_id:
         return flask.jsonify({"user_info": {"auth": 0, "message": user}}), 401
     
+    portals = getPortals()
+    
     # Parse stream_id to find the VOD
     portal_id = None
     item_id = None
@@ -7828,7 +8587,6 @@ def xc_movie_stream(username, password, stream_id, extension=None):
     elif str(stream_id).isdigit():
         # Numeric format - search through all VODs
         numeric_id = int(stream_id)
-        portals = getPortals()
         allowed_portals = user.get("allowed_portals", [])
         
         try:
@@ -7881,7 +8639,6 @@ def xc_movie_stream(username, password, stream_id, extension=None):
         }), 404
     
     # Get the stream URL for this VOD
-    portals = getPortals()
     portal = portals.get(portal_id)
     if not portal:
         logger.error(f"XC API: Portal {portal_id} not found")
@@ -7989,7 +8746,6 @@ def xc_movie_stream(username, password, stream_id, extension=None):
 @xc_auth_only
 def xc_series_stream(username, password, stream_id, extension=None):
     """XC API series stream endpoint for episodes."""
-    import hashlib
     
     settings = getSettings()
     if settings.get("xc api enabled") != "true":
@@ -7999,6 +8755,8 @@ def xc_series_stream(username, password, stream_id, extension=None):
     if not user_id:
         return flask.jsonify({"user_info": {"auth": 0, "message": user}}), 401
     
+    portals = getPortals()
+    
     # Parse stream_id to find the episode
     portal_id = None
     series_id = None
@@ -8010,7 +8768,6 @@ def xc_series_stream(username, password, stream_id, extension=None):
     if not (portal_id and series_id and season_num and episode_num) and str(stream_id).isdigit():
         # Numeric format - search through all episodes
         numeric_id = int(stream_id)
-        portals = getPortals()
         allowed_portals = user.get("allowed_portals", [])
         
         try:
@@ -8076,7 +8833,6 @@ def xc_series_stream(username, password, stream_id, extension=None):
     if not portal_id or not series_id or episode_num is None:
         return flask.jsonify({"error": "Episode not found"}), 404
     
-    portals = getPortals()
     portal = portals.get(portal_id)
     if not portal:
         return flask.jsonify({"error": "Portal not found"}), 404
@@ -8176,16 +8932,7 @@ def xc_series_stream(username, password, stream_id, extension=None):
 @xc_auth_only
 def xc_xmltv():
     """XC API XMLTV endpoint."""
-    global cached_xmltv, last_updated
-    
-    # Refresh cache if needed
-    if cached_xmltv is None or (time.time() - last_updated) > 900:
-        refresh_xmltv()
-    
-    return Response(
-        cached_xmltv,
-        mimetype="text/xml",
-    )
+    return _cached_xmltv_response()
 
 
 def stream_channel(portalId, channelId, xc_user=None):
@@ -8232,8 +8979,13 @@ def stream_channel(portalId, channelId, xc_user=None):
                 stdout=subprocess.PIPE,
                 stderr=subprocess.DEVNULL,
             ) as ffmpeg_sp:
+                enlarge_pipe(ffmpeg_sp.stdout.fileno())
+                # waitress owns the client socket and writes yielded chunks from its own
+                # I/O loop, so splice(2) from this pipe to the socket is not possible -
+                # large read1() chunks are the cheapest copy path available here.
                 while True:
-                    chunk = ffmpeg_sp.stdout.read(1024)
+                    # read1 returns whatever is buffered (up to 64 KiB) in one syscall
+                    chunk = ffmpeg_sp.stdout.read1(65536)
                     if len(chunk) == 0:
                         if ffmpeg_sp.poll() != 0:
                             logger.info("Ffmpeg closed with error({}). Moving MAC({}) for Portal({})".format(str(ffmpeg_sp.poll()), mac, portalName))
@@ -8314,9 +9066,7 @@ def stream_channel(portalId, channelId, xc_user=None):
 
         if channel:
             # Channel bereits gefunden - keine Schleife nötig!
-            channelName = portal.get("custom channel names", {}).get(channelId)
-            if channelName == None:
-                channelName = channel["name"]
+            channelName = portal.get("custom channel names", {}).get(channelId, channel["name"])
             cmd = channel["cmd"]
 
         if cmd:
@@ -8425,7 +9175,7 @@ def channel(portalId, channelId):
         system_username = settings.get("username", "admin")
         system_password = settings.get("password", "12345")
         
-        if auth.username != system_username or auth.password != system_password:
+        if not credentials_match(auth.username, auth.password, system_username, system_password):
             logger.warning(f"Invalid Basic Auth credentials for stream: {auth.username}")
             response = Response(
                 'Invalid credentials for stream access\n'
@@ -8440,11 +9190,31 @@ def channel(portalId, channelId):
         return stream_channel(portalId, channelId)
 
 
+def send_segment(file_path, mimetype):
+    """
+    Serve an HLS playlist or segment straight from disk.
+    
+    The file object is handed to the server's wsgi.file_wrapper (waitress
+    streams it from the file descriptor) instead of being read into Python.
+    Segment names (seg_000...) are reused each time ffmpeg restarts for the
+    channel, so neither segments nor playlists may be cached by clients.
+    
+    Args:
+        file_path (str): Path of the file inside the stream's temp directory
+        mimetype (str): MIME type to send
+        
+    Returns:
+        Response: Flask response wrapping the open file
+    """
+    response = send_file(file_path, mimetype=mimetype, conditional=True, etag=False)
+    response.direct_passthrough = True
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @app.route("/hls/<portalId>/<channelId>/<path:filename>", methods=["GET"])
 def hls_stream(portalId, channelId, filename):
     """Serve HLS streams (playlists and segments)."""
-    from flask import send_file
-    
     # Get portal info
     portal = getPortals().get(portalId)
     if not portal:
@@ -8463,12 +9233,12 @@ def hls_stream(portalId, channelId, filename):
     stream_key = f"{portalId}_{channelId}"
     
     # First, check if stream is already active
-    stream_exists = stream_key in hls_manager.streams
+    active_stream = hls_manager.streams.get(stream_key)
     
-    if stream_exists:
+    if active_stream is not None:
         # For active streams, wait a bit for the file if it's a playlist
         if filename.endswith('.m3u8'):
-            is_passthrough = hls_manager.streams[stream_key].get('is_passthrough', False)
+            is_passthrough = active_stream.get('is_passthrough', False)
             max_wait = 100 if not is_passthrough else 10
             
             for wait_count in range(max_wait):
@@ -8538,6 +9308,29 @@ def hls_stream(portalId, channelId, filename):
             logger.error(f"Error starting HLS stream: {e}")
             return make_response("Error starting stream", 500)
     
+    # LL-HLS blocking playlist reload: hold the request until the requested segment exists
+    if file_path and filename == "stream.m3u8" and getSettings().get("hls low latency", "false") == "true":
+        msn = request.args.get("_HLS_msn")
+        if msn is not None:
+            try:
+                msn = int(msn)
+            except ValueError:
+                return make_response("Invalid _HLS_msn", 400)
+            hls_manager.wait_for_media_sequence(portalId, channelId, msn, timeout=3.0)
+        
+        try:
+            with open(file_path) as f:
+                content = f.read()
+        except OSError:
+            logger.warning(f"Playlist vanished: {filename} for stream {stream_key}")
+            return make_response("File not found", 404)
+        
+        content = content.replace("#EXTM3U\n", "#EXTM3U\n#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES\n", 1)
+        response = make_response(content)
+        response.headers['Content-Type'] = 'application/vnd.apple.mpegurl'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
     # Serve the file
     if file_path and os.path.exists(file_path):
         # Determine MIME type
@@ -8552,7 +9345,7 @@ def hls_stream(portalId, channelId, filename):
         else:
             mimetype = 'application/octet-stream'
         
-        return send_file(file_path, mimetype=mimetype)
+        return send_segment(file_path, mimetype)
     else:
         logger.warning(f"File not found: {filename} for stream {stream_key}")
         return make_response("File not found", 404)
@@ -8619,8 +9412,7 @@ def hdhr(f):
         if (
             security == "false"
             or auth
-            and auth.username == username
-            and auth.password == password
+            and credentials_match(auth.username, auth.password, username, password)
         ):
             if hdhrenabled:
                 return f(*args, **kwargs)
@@ -8668,7 +9460,7 @@ def refresh_lineup():
     portals = getPortals()
     for portal in portals:
         if portals[portal]["enabled"] == "true":
-            enabledChannels = portals[portal].get("enabled channels", [])
+            enabledChannels = set(portals[portal].get("enabled channels", []))
             if len(enabledChannels) != 0:
                 name = portals[portal]["name"]
                 url = portals[portal]["url"]
@@ -8690,12 +9482,8 @@ def refresh_lineup():
                     for channel in allChannels:
                         channelId = str(channel.get("id"))
                         if channelId in enabledChannels:
-                            channelName = customChannelNames.get(channelId)
-                            if channelName is None:
-                                channelName = str(channel.get("name"))
-                            channelNumber = customChannelNumbers.get(channelId)
-                            if channelNumber is None:
-                                channelNumber = str(channel.get("number"))
+                            channelName = customChannelNames.get(channelId, str(channel.get("name")))
+                            channelNumber = customChannelNumbers.get(channelId, str(channel.get("number")))
 
                             lineup.append(
                                 {
@@ -8786,8 +9574,8 @@ def get_recent_logs():
         return jsonify([])
 
 def start_refresh():
-    threading.Thread(target=refresh_lineup, daemon=True).start()
-    threading.Thread(target=refresh_xmltv, daemon=True).start()
+    schedule_refresh(refresh_lineup)
+    schedule_refresh(refresh_xmltv)
 
 
 @app.route("/proxy/test", methods=["POST"])
@@ -8976,10 +9764,32 @@ if __name__ == "__main__":
                 channel_cache.cleanup_expired()
             except Exception as e:
                 logger.error(f"Error in cache cleanup: {e}")
+            try:
+                # In-memory heap drain only - connection state is never written to disk
+                cleanupOldXCConnections()
+            except Exception as e:
+                logger.error(f"Error in XC connection cleanup: {e}")
     
     threading.Thread(target=cache_cleanup_task, daemon=True).start()
     logger.info("Channel cache cleanup task started (runs every hour)")
     
-    # Always use waitress for production in container
-    logger.info("Starting Waitress server on 0.0.0.0:8001")
-    waitress.serve(app, host="0.0.0.0", port=8001, _quiet=True, threads=24) 
\ No newline at end of file
+    # Always use waitress for production in container.
+    # Single process on purpose: sessions, HLS streams, MAC occupation and the
+    # playlist/EPG caches are all in-process state that workers could not share.
+    try:
+        waitress_threads = int(os.getenv("THREADS", "24"))
+    except ValueError:
+        waitress_threads = 24
+        logger.warning("Invalid THREADS value, using default: 24")
+    
+    logger.info(f"Starting Waitress server on 0.0.0.0:8001 with {waitress_threads} threads")
+    waitress.serve(
+        app,
+        host="0.0.0.0",
+        port=8001,
+        _quiet=True,
+        threads=waitress_threads,
+        # poll() instead of select() - no FD_SETSIZE limit with many long-lived stream sockets
+        asyncore_use_poll=True,
+        connection_limit=max(100, waitress_threads * 10),
+    )
@@ -21,6 +21,7 @@ logger.setLevel(logging.DEBUG)
 _session = None
 _session_created = 0
 _SESSION_MAX_AGE = 300  # Refresh session every 5 minutes
+_POOL_SIZE = 32  # Keep-alive connections per portal host, enough for the app's worker pools
 
 
 def _get_session(use_cloudscraper=False):
@@ -50,8 +51,9 @@ def _get_session(use_cloudscraper=False):
         else:
             _session = requests.Session()
             retries = Retry(total=3, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-            _session.mount("http://", HTTPAdapter(max_retries=retries))
-            _session.mount("https://", HTTPAdapter(max_retries=retries))
+            adapter = HTTPAdapter(pool_connections=_POOL_SIZE, pool_maxsize=_POOL_SIZE, max_retries=retries)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
             logger.debug("Created new requests session")
         
         _session_created = current_time
@@ -662,11 +664,8 @@ def getGenres(url, mac, token, proxy=None):
 def getGenreNames(url, mac, token, proxy=None):
     try:
         genreData = getGenres(url, mac, token, proxy)
-        genres = {}
-        for i in genreData:
-            gid = i["id"]
-            name = i["title"]
-            genres[gid] = name
+        # Key by str id - callers look genres up with str(channel["tv_genre_id"])
+        genres = {str(i["id"]): i["title"] for i in genreData}
         if genres:
             return genres
     except:
@@ -737,7 +736,11 @@ def getLink(url, mac, token, cmd, proxy=None):
 
 
 def getEpg(url, mac, token, period, proxy=None):
-    """Get EPG with support for GET and POST methods."""
+    """Get EPG with support for GET and POST methods.
+
+    Returns the portal's EPG data; an empty result if the portal answered but
+    has no EPG, or None if neither request succeeded.
+    """
     proxies = parse_proxy_url(proxy) if proxy else None
     proxy_type = get_proxy_type(proxy) if proxy else 'none'
     cookies = {"mac": mac, "stb_lang": "en", "timezone": "Europe/London"}
@@ -753,6 +756,8 @@ def getEpg(url, mac, token, period, proxy=None):
         "JsHttpRequest": "1-xml"
     }
     
+    empty_result = None
+    
     # Try GET first
     try:
         logger.debug(f"Getting EPG for MAC {mac} (GET)")
@@ -770,6 +775,7 @@ def getEpg(url, mac, token, period, proxy=None):
         if data:
             logger.debug(f"Got EPG data for {len(data)} channels via GET")
             return data
+        empty_result = data
     except Exception as e:
         logger.debug(f"GET EPG failed: {e}, trying POST")
     
@@ -790,10 +796,11 @@ def getEpg(url, mac, token, period, proxy=None):
         if data:
             logger.debug(f"Got EPG data for {len(data)} channels via POST")
             return data
+        empty_result = data
     except Exception as e:
         logger.debug(f"POST EPG failed: {e}")
     
-    return None
+    return empty_result
 
 
 def parseM3U(content):
@@ -2,11 +2,64 @@
 Utility functions for MacReplayXC
 """
 import re
+import json
 import logging
+from functools import lru_cache
 
 logger = logging.getLogger("MacReplayXC")
 
+# Try to import orjson for faster JSON parsing/serialization
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+    logger.info("orjson not available - falling back to stdlib json")
 
+
+def json_loads(data):
+    """
+    Parse JSON from str or bytes, using orjson when available.
+    
+    Args:
+        data (str/bytes): JSON document
+        
+    Returns:
+        Parsed Python object
+        
+    Raises:
+        json.JSONDecodeError: If the document is invalid (orjson's error is a subclass)
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, indent=False):
+    """
+    Serialize an object to UTF-8 JSON bytes, using orjson when available.
+    
+    Args:
+        obj: Object to serialize
+        indent (bool): Pretty-print with 2-space indentation
+        
+    Returns:
+        bytes: Serialized JSON
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+
+# Six hex octets, each optionally followed by ':' or '-' (compiled once, matched with fullmatch)
+MAC_ADDRESS_RE = re.compile(r'(?:[0-9A-Fa-f]{2}[:-]?){5}[0-9A-Fa-f]{2}')
+MAC_SEPARATOR_RE = re.compile(r'[:-]')
+
+
+@lru_cache(maxsize=4096)
 def validate_mac_address(mac):
     """
     Validate MAC address format.
@@ -25,10 +78,10 @@ def validate_mac_address(mac):
     if not mac or not isinstance(mac, str):
         return False
     
-    pattern = r'^([0-9A-Fa-f]{2}[:-]?){5}([0-9A-Fa-f]{2})$'
-    return bool(re.match(pattern, mac.strip()))
+    return MAC_ADDRESS_RE.fullmatch(mac.strip()) is not None
 
 
+@lru_cache(maxsize=4096)
 def validate_url(url):
     """
     Validate URL format.
@@ -46,6 +99,7 @@ def validate_url(url):
     return bool(re.match(pattern, url.strip()))
 
 
+@lru_cache(maxsize=4096)
 def normalize_mac_address(mac):
     """
     Normalize MAC address to standard format (XX:XX:XX:XX:XX:XX).
@@ -60,7 +114,7 @@ def normalize_mac_address(mac):
         return mac
     
     # Remove all separators
-    clean_mac = re.sub(r'[:-]', '', mac.strip())
+    clean_mac = MAC_SEPARATOR_RE.sub('', mac.strip())
     
     # Add colons every 2 characters
     normalized = ':'.join(clean_mac[i:i+2] for i in range(0, 12, 2))
@@ -201,6 +255,7 @@ def get_client_ip(request):
     return request.remote_addr or 'unknown'
 
 
+@lru_cache(maxsize=4096)
 def is_hls_url(url):
     """
     Check if URL is an HLS stream.